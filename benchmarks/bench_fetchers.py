@@ -0,0 +1,228 @@
+"""
+Offline benchmark of every fetcher and of the whole FetchEngine pipeline.
+
+All sources are served by the local stub in benchmarks/stub_servers.py, so runs are
+repeatable and never touch the real APIs. Each scenario runs in its own child
+process (so peak RSS is per scenario) with the response cache off and rate limits
+lifted, and writes into a temporary database.
+
+    python benchmarks/bench_fetchers.py --latency 20 --pages 5 --page-size 200
+    python benchmarks/bench_fetchers.py --compare benchmarks/results/<previous>.json
+
+Google Scholar is not covered: scholarly does its own HTTP and cannot be redirected.
+"""
+import argparse
+import contextlib
+import io
+import json
+import math
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, "src"))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from stub_servers import StubServer
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+PHRASES = ["Genomic offset", "Plant adaptation", "Climate change"]
+SCENARIOS = ["crossref", "pubmed", "hal", "hal_search", "theses_fr", "paperity", "universities", "pipeline"]
+# Metrics compared by --compare, and whether higher is better
+COMPARED = {"records_per_s": True, "requests_per_s": True, "latency_p99_ms": False, "peak_rss_mb": False}
+
+def _run(name, sink, total, tmp):
+    import Main
+    import FetchEngine
+    import UniversityDbCreator
+
+    if name == "crossref":
+        return Main.fetch_crossref(PHRASES, sink=sink)
+    if name == "pubmed":
+        return Main.fetch_pubmed(PHRASES, sink=sink, fetch_abstracts=True)
+    if name == "hal":
+        return Main.fetch_articles_hal(PHRASES, max_records=None, sink=sink, quiet=True)
+    if name == "hal_search":
+        return Main.fetch_hal(PHRASES, sink=sink)
+    if name == "theses_fr":
+        return Main.fetch_theses_fr(PHRASES, max_results=total, sink=sink)
+    if name == "paperity":
+        return Main.fetch_paperity(PHRASES, sink=sink)
+    if name == "universities":
+        return UniversityDbCreator.scrape_all_universities(
+            os.path.join(tmp, "universities.csv"), os.path.join(tmp, "checkpoint.txt"))
+    return FetchEngine.fetch_all(PHRASES, sink=sink)["records"]
+
+def run_scenario(name, urls, total, keep_limits=False, verbose=False):
+    """Runs one scenario against the stub at `urls`; meant to be called in a fresh process."""
+    import requests
+    import Main
+    import UniversityDbCreator
+    from urllib.parse import urlsplit
+    from utils.Database_Calls import create_database, PaperSink
+    from utils.Http_Client import configure_cache
+    from utils.Proxies import ProxyPool
+    from utils.Rate_Limit import RATE_LIMITER
+
+    for module in (Main, UniversityDbCreator):
+        for constant, url in urls.items():
+            if hasattr(module, constant):
+                setattr(module, constant, url)
+    configure_cache(enabled=False)
+    # Don't validate free proxies against the internet; go direct
+    UniversityDbCreator.PROXY_POOL = ProxyPool(candidates=list)
+    if not keep_limits:
+        host = urlsplit(urls["CROSSREF_URL"]).netloc
+        RATE_LIMITER.configure(host, rate=1e6, max_rate=1e6, burst=1e6)
+
+    latencies, statuses = [], []
+    real_request = requests.Session.request
+
+    # Every request, pooled session or not, ends up in Session.request
+    def timed_request(session, *args, **kwargs):
+        start = time.perf_counter()
+        response = real_request(session, *args, **kwargs)
+        latencies.append(time.perf_counter() - start)
+        statuses.append(response.status_code)
+        return response
+
+    requests.Session.request = timed_request
+    with tempfile.TemporaryDirectory() as tmp, contextlib.ExitStack() as quiet:
+        if not verbose:
+            quiet.enter_context(contextlib.redirect_stdout(io.StringIO()))
+            quiet.enter_context(contextlib.redirect_stderr(io.StringIO()))
+        db_path = os.path.join(tmp, "bench.db")
+        create_database(db_path)
+        start = time.perf_counter()
+        with PaperSink(db_path) as sink:
+            records = _run(name, sink, total, tmp) or 0
+        elapsed = time.perf_counter() - start
+
+    try:
+        import resource
+        # ru_maxrss is in KiB on Linux
+        peak_rss_mb = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    except ImportError:
+        peak_rss_mb = None
+    latencies.sort()
+    return {
+        "records": records,
+        "requests": len(latencies),
+        "errors": sum(1 for s in statuses if s >= 400),
+        "seconds": round(elapsed, 3),
+        "records_per_s": round(records / elapsed, 1),
+        "requests_per_s": round(len(latencies) / elapsed, 1),
+        "latency_p50_ms": _percentile(latencies, 50),
+        "latency_p99_ms": _percentile(latencies, 99),
+        "peak_rss_mb": peak_rss_mb,
+    }
+
+def _percentile(sorted_seconds, p):
+    """Nearest-rank percentile in milliseconds."""
+    if not sorted_seconds:
+        return 0.0
+    rank = max(1, math.ceil(p / 100 * len(sorted_seconds)))
+    return round(sorted_seconds[rank - 1] * 1000, 2)
+
+def compare(results, previous, threshold):
+    """Prints the change of each COMPARED metric; returns the regressions beyond `threshold`."""
+    regressions = []
+    for name, current in results.items():
+        before = previous.get("results", {}).get(name)
+        if not before:
+            continue
+        changes = []
+        for metric, higher_is_better in COMPARED.items():
+            old, new = before.get(metric), current.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            worse = -change if higher_is_better else change
+            flag = "❌" if worse > threshold else ""
+            if flag:
+                regressions.append(f"{name}.{metric}")
+            changes.append(f"{metric} {change:+.0%}{flag}")
+        print(f"  {name:<13} " + "  ".join(changes))
+    return regressions
+
+def _git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--latency", type=float, default=20, help="stub response latency in ms")
+    parser.add_argument("--jitter", type=float, default=10, help="extra random latency in ms")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of 503 responses")
+    parser.add_argument("--pages", type=int, default=5)
+    parser.add_argument("--page-size", type=int, default=200)
+    parser.add_argument("--keep-rate-limits", action="store_true",
+                        help="keep the real per-source rate limits instead of lifting them")
+    parser.add_argument("--output", help="results file (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="relative change counted as a regression by --compare")
+    parser.add_argument("--verbose", action="store_true", help="show the fetchers' own output")
+    args = parser.parse_args()
+
+    config = {
+        "latency_ms": args.latency,
+        "jitter_ms": args.jitter,
+        "error_rate": args.error_rate,
+        "pages": args.pages,
+        "page_size": args.page_size,
+        "keep_rate_limits": args.keep_rate_limits,
+    }
+    stub = StubServer(latency=args.latency / 1000, jitter=args.jitter / 1000, error_rate=args.error_rate,
+                      pages=args.pages, page_size=args.page_size)
+    stub.start()
+    results = {}
+    spawn = multiprocessing.get_context("spawn")
+    try:
+        for name in args.scenarios.split(","):
+            # A fresh process per scenario keeps peak RSS and module state separate
+            with ProcessPoolExecutor(max_workers=1, mp_context=spawn) as pool:
+                results[name] = pool.submit(run_scenario, name, stub.urls(), stub.total,
+                                            args.keep_rate_limits, args.verbose).result()
+            r = results[name]
+            print(f"{name:<13} {r['records']:>7} records {r['requests']:>5} requests {r['seconds']:>7.2f}s "
+                  f"{r['records_per_s']:>9,.0f} rec/s {r['requests_per_s']:>7,.1f} req/s "
+                  f"p50 {r['latency_p50_ms']:>7.1f}ms p99 {r['latency_p99_ms']:>7.1f}ms "
+                  f"rss {r['peak_rss_mb']}MB")
+    finally:
+        stub.stop()
+
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "revision": _git_revision(),
+        "python": sys.version.split()[0],
+        "config": config,
+        "results": results,
+    }
+    output = args.output or os.path.join(RESULTS_DIR, time.strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results saved to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+        if previous.get("config") != config:
+            print("⚠️ Stub configuration differs from the compared run; changes may not be meaningful")
+        print(f"Compared with {args.compare} ({previous.get('revision')}):")
+        regressions = compare(results, previous, args.threshold)
+        if regressions:
+            print(f"❌ Regressions beyond {args.threshold:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+        print("✅ No regressions")
@@ -0,0 +1,71 @@
+"""
+Compares the HTML parser backends of utils/Html_Parsers.py on saved pages.
+
+Every backend's output is checked against the reference "soup" backend (the
+original full BeautifulSoup parse) before it is timed. Pages are built from the
+sample rows in benchmarks/payloads/, or read from --pages-dir, where files named
+paperity*.html and universityguru*.html are picked up.
+
+    python benchmarks/bench_html_parsers.py --pages 50 --rows 100 --workers 4
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.Html_Parsers import BACKENDS, parse, parse_many
+
+PAYLOADS_DIR = os.path.join(os.path.dirname(__file__), "payloads")
+PAGE_TYPES = {"paperity": "paperity_row.html", "universityguru": "universityguru_university.html"}
+# Layout around the results, so parsers also have to skip the rest of a page
+PAGE_SHELL = ("<html><head><title>Results</title><script>var x = 1;</script></head><body>"
+              "<nav class=\"navbar\"><ul>" + "<li><a href=\"/menu\">Menu item</a></li>" * 40 + "</ul></nav>"
+              "<div class=\"container\">{rows}</div>"
+              "<footer>" + "<p>Footer text with <a href=\"/link\">a link</a></p>" * 40 + "</footer></body></html>")
+
+def make_pages(page_type, pages, rows):
+    with open(os.path.join(PAYLOADS_DIR, PAGE_TYPES[page_type]), encoding="utf-8") as f:
+        row = f.read().strip()
+    return [PAGE_SHELL.format(rows="".join(row.replace("__N__", str(p * rows + i)) for i in range(rows)))
+            for p in range(pages)]
+
+def load_pages(pages_dir, page_type):
+    pages = []
+    for path in sorted(glob.glob(os.path.join(pages_dir, f"{page_type}*.html"))):
+        with open(path, encoding="utf-8", errors="replace") as f:
+            pages.append(f.read())
+    return pages
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pages", type=int, default=50, help="generated pages per page type")
+    parser.add_argument("--rows", type=int, default=100, help="result rows per generated page")
+    parser.add_argument("--pages-dir", help="directory of saved pages to use instead")
+    parser.add_argument("--workers", type=int, default=4, help="process pool size for the batch run")
+    args = parser.parse_args()
+
+    for page_type in PAGE_TYPES:
+        pages = load_pages(args.pages_dir, page_type) if args.pages_dir else make_pages(page_type, args.pages, args.rows)
+        if not pages:
+            continue
+        print(f"{page_type}: {len(pages)} pages, {sum(map(len, pages)) / 1e6:.1f} MB")
+        reference = [parse(page_type, html, "soup") for html in pages]
+        timings = {}
+        for backend in BACKENDS:
+            start = time.perf_counter()
+            result = [parse(page_type, html, backend) for html in pages]
+            timings[backend] = time.perf_counter() - start
+            match = "✅ same output" if result == reference else "❌ output differs from soup"
+            print(f"  {backend:>10}: {timings[backend]:.3f}s  "
+                  f"({timings['soup'] / timings[backend]:.1f}x vs soup)  {match}")
+
+        fastest = min(timings, key=timings.get)
+        start = time.perf_counter()
+        result = parse_many(page_type, pages, fastest, workers=args.workers)
+        elapsed = time.perf_counter() - start
+        match = "✅ same output" if result == reference else "❌ output differs from soup"
+        print(f"  {fastest:>10} in {args.workers} processes: {elapsed:.3f}s  "
+              f"({timings['soup'] / elapsed:.1f}x vs soup)  {match}")
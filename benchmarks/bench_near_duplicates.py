@@ -0,0 +1,89 @@
+"""
+Compares MinHash/LSH near-duplicate clustering with a pairwise title comparison.
+
+Builds a synthetic papers table in a temporary directory where every tenth paper
+comes back from a second source with a variant title (casing, punctuation,
+accents or a subtitle), then reports throughput, recall and false merges.
+
+    python benchmarks/bench_near_duplicates.py --sizes 2000,100000 --pairwise-max 5000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import string
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.Database_Calls import create_database, normalize_title, PaperSink
+from utils.Near_Duplicates import THRESHOLD, shingles, update_near_duplicates, _jaccard
+
+VARIANTS = [
+    lambda t: t.upper(),
+    lambda t: t.capitalize() + ".",
+    lambda t: t.replace("e", "é", 2),
+    lambda t: t + ": a review",
+]
+
+def fill(db_path, rows, seed=42):
+    """Writes `rows` papers plus one variant per tenth paper; returns the expected pairs."""
+    rng = random.Random(seed)
+    words = ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 10))) for _ in range(20000)]
+    expected = []
+    with PaperSink(db_path, batch_size=10000) as sink:
+        for i in range(rows):
+            title = " ".join(rng.choices(words, k=rng.randint(5, 14)))
+            sink.add(title=title, authors=f"Author{i} Lee", year=2000 + i % 25, source="Crossref",
+                     link="", abstract="", keywords="bench")
+            if i % 10 == 0:
+                sink.add(title=VARIANTS[i // 10 % len(VARIANTS)](title), authors=f"Lee A{i}, Author{i} Lee",
+                         year=2000 + i % 25, source="PubMed", link="", abstract="", keywords="bench")
+                expected.append(normalize_title(title))
+    return expected
+
+def pairwise(db_path):
+    # The O(n²) alternative: compare every title with every earlier one
+    conn = sqlite3.connect(db_path)
+    titles = [shingles(t) for (t,) in conn.execute("SELECT title_norm FROM papers ORDER BY id")]
+    conn.close()
+    return sum(1 for i, a in enumerate(titles) for b in titles[:i] if _jaccard(a, b) >= THRESHOLD)
+
+def lsh_quality(db_path, expected):
+    conn = sqlite3.connect(db_path)
+    sizes = conn.execute("SELECT COUNT(*), SUM(size = 2), SUM(size > 2) FROM canonical_papers").fetchone()
+    found = {t for (t,) in conn.execute('''
+        SELECT MIN(p.title_norm) FROM paper_clusters c JOIN papers p ON p.id = c.paper_id GROUP BY c.cluster_id
+    ''')}
+    conn.close()
+    recall = len(found & set(expected)) / len(expected) if expected else 1.0
+    return recall, sizes
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default="2000,100000")
+    parser.add_argument("--pairwise-max", type=int, default=5000,
+                        help="largest table the pairwise comparison is run on")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in (int(s) for s in args.sizes.split(",")):
+            db_path = os.path.join(tmp, f"papers_{size}.db")
+            create_database(db_path)
+            expected = fill(db_path, size)
+            rows = size + len(expected)
+            start = time.perf_counter()
+            update_near_duplicates(db_path)
+            lsh = time.perf_counter() - start
+            recall, (clusters, pairs, larger) = lsh_quality(db_path, expected)
+            print(f"\n{rows:,} papers, {len(expected):,} planted duplicates")
+            print(f"  LSH       {lsh:8.2f}s  {rows / lsh:9,.0f} papers/s  recall {recall:.1%}  "
+                  f"{clusters:,} clusters ({larger or 0} with more than two papers)")
+            if rows <= args.pairwise_max:
+                start = time.perf_counter()
+                matches = pairwise(db_path)
+                seconds = time.perf_counter() - start
+                print(f"  pairwise  {seconds:8.2f}s  {rows / seconds:9,.0f} papers/s  {matches:,} pairs "
+                      f"above {THRESHOLD}  ({seconds / lsh:.1f}x slower)")
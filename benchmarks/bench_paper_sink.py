@@ -0,0 +1,65 @@
+"""
+Compares the per-row insert_paper path with the batched PaperSink.
+
+Both runs write into fresh temporary databases, so research.db is never touched.
+
+    python benchmarks/bench_paper_sink.py --rows 10000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.Database_Calls import create_database, insert_paper, PaperSink
+
+def make_rows(n):
+    return [
+        dict(
+            title=f"Benchmark paper {i}",
+            authors="Jane Doe, John Smith",
+            year=2000 + i % 25,
+            source="Benchmark",
+            link=f"https://example.org/paper/{i}",
+            abstract="Lorem ipsum dolor sit amet " * 8,
+            keywords="Genomic offset OR Climate change",
+            citations=i % 50,
+        )
+        for i in range(n)
+    ]
+
+def bench_per_row(db_path, rows):
+    start = time.perf_counter()
+    for row in rows:
+        insert_paper(**row, db_path=db_path)
+    return time.perf_counter() - start
+
+def bench_sink(db_path, rows, batch_size):
+    start = time.perf_counter()
+    with PaperSink(db_path, batch_size=batch_size) as sink:
+        for row in rows:
+            sink.add(**row)
+    return time.perf_counter() - start
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows)
+    with tempfile.TemporaryDirectory() as tmp:
+        results = {}
+        for name in ("insert_paper", "PaperSink"):
+            db_path = os.path.join(tmp, f"{name}.db")
+            create_database(db_path)
+            if name == "insert_paper":
+                elapsed = bench_per_row(db_path, rows)
+            else:
+                elapsed = bench_sink(db_path, rows, args.batch_size)
+            results[name] = elapsed
+            print(f"{name:>12}: {args.rows} rows in {elapsed:.3f}s -> {args.rows / elapsed:,.0f} rows/s")
+
+    print(f"Speedup: {results['insert_paper'] / results['PaperSink']:.1f}x")
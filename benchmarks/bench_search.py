@@ -0,0 +1,79 @@
+"""
+Compares the old LIKE '%kw%' scan with the FTS5 index behind search_papers.
+
+Builds synthetic papers tables of each requested size in a temporary directory.
+
+    python benchmarks/bench_search.py --sizes 100000,1000000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.Database_Calls import create_database, search_papers, PaperSink
+
+VOCABULARY = (
+    "genomic offset plant adaptation climate change forest drought tolerance population "
+    "landscape genetics selection variance allele frequency phenotype temperature "
+    "precipitation model prediction species distribution migration resilience ecosystem "
+    "biodiversity conservation evolution genome sequencing marker association"
+).split()
+
+QUERIES = ["genomics", "genomic", "drought tolerance", "resilience", "adapt*"]
+
+def fill(db_path, rows, seed=42):
+    # Topic words are rare among a large filler vocabulary, as in a real corpus
+    rng = random.Random(seed)
+    population = VOCABULARY + [f"term{i}" for i in range(20000)]
+    words = lambda n: " ".join(rng.choices(population, k=n))
+    with PaperSink(db_path, batch_size=10000) as sink:
+        for i in range(rows):
+            sink.add(
+                title=words(8).capitalize(),
+                authors=f"Author {rng.randrange(50000)}, Author {rng.randrange(50000)}",
+                year=rng.randrange(1990, 2025),
+                source="Benchmark",
+                link=f"https://example.org/paper/{i}",
+                abstract=words(60),
+                keywords=words(3),
+            )
+
+def search_like(db_path, keyword):
+    # The pre-FTS implementation of search_papers
+    conn = sqlite3.connect(db_path)
+    results = conn.execute('''
+        SELECT * FROM papers WHERE title LIKE ? OR authors LIKE ? OR abstract LIKE ? OR keywords LIKE ?
+    ''', (f'%{keyword}%',) * 4).fetchall()
+    conn.close()
+    return results
+
+def timed(func, *args, repeat=3, **kwargs):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args, **kwargs)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default="100000,1000000")
+    parser.add_argument("--limit", type=int, default=100)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in (int(s) for s in args.sizes.split(",")):
+            db_path = os.path.join(tmp, f"papers_{size}.db")
+            create_database(db_path)
+            start = time.perf_counter()
+            fill(db_path, size)
+            print(f"\n{size:,} rows (built in {time.perf_counter() - start:.1f}s)")
+            for query in QUERIES:
+                like = timed(search_like, db_path, query)
+                fts = timed(search_papers, query, limit=args.limit, db_path=db_path)
+                print(f"  {query!r:<20} LIKE {like * 1000:9.1f} ms   FTS5 {fts * 1000:7.1f} ms   {like / fts:7.1f}x")
@@ -0,0 +1,220 @@
+"""
+Local stand-ins for every HTTP source the crawler talks to.
+
+One threaded HTTP/1.1 server answers for Crossref, PubMed E-utilities, HAL (OAI-PMH and
+search API), Thèses.fr, Paperity, universityguru and geonames under different path prefixes.
+Records are replayed from the sample payloads in benchmarks/payloads/ (one record
+per source, in the API's own format; paste a real recorded record there to change
+them), cloned with a running number so every record is distinct.
+
+Latency, jitter, the share of 503 errors and the result-set size are configurable.
+"""
+import json
+import os
+import random
+import sys
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+
+PAYLOADS_DIR = os.path.join(os.path.dirname(__file__), "payloads")
+
+def _load(name):
+    with open(os.path.join(PAYLOADS_DIR, name), encoding="utf-8") as f:
+        return f.read().strip()
+
+def _clone(template, n):
+    return template.replace("__N__", str(n))
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, body, content_type):
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        if status == 503:
+            self.send_header("Retry-After", "0")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        stub = self.server.stub
+        parts = urlsplit(self.path)
+        query = {k: v[-1] for k, v in parse_qs(parts.query).items()}
+        stub.count(parts.path)
+        time.sleep(stub.latency + stub.rng.uniform(0, stub.jitter))
+        if stub.error_rate and stub.rng.random() < stub.error_rate:
+            return self._send(503, "Service Unavailable", "text/plain")
+        for prefix, route in stub.routes:
+            if parts.path.startswith(prefix):
+                return self._send(200, *route(parts.path[len(prefix):], query))
+        self._send(404, "Not Found", "text/plain")
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients dropping keep-alive connections are expected, not worth a traceback
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+class StubServer:
+    """
+    Serves every source from http://127.0.0.1:<port>.
+
+    - latency / jitter: seconds added to each response (jitter is uniform on top).
+    - error_rate: probability of answering 503 instead.
+    - pages / page_size: each search source has pages * page_size hits; sources whose
+      page size is chosen by the server (HAL, Thèses.fr) use page_size.
+    """
+
+    def __init__(self, latency=0.02, jitter=0.01, error_rate=0.0, pages=5, page_size=200, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.pages = pages
+        self.page_size = page_size
+        self.total = pages * page_size
+        self.rng = random.Random(seed)
+        self.requests = {}
+        self._lock = threading.Lock()
+        self.templates = {
+            "crossref": json.loads(_load("crossref_item.json")),
+            "pubmed_summary": _load("pubmed_summary.json"),
+            "pubmed_article": _load("pubmed_article.xml"),
+            "hal": _load("hal_oai_record.xml"),
+            "hal_search": _load("hal_search_doc.json"),
+            "theses_fr": _load("theses_fr_thesis.json"),
+            "theses_fr_detail": _load("theses_fr_detail.json"),
+            "paperity": _load("paperity_row.html"),
+            "universityguru": _load("universityguru_university.html"),
+        }
+        self.routes = [
+            ("/crossref/works", self.crossref),
+            ("/eutils/", self.eutils),
+            ("/hal/oai", self.hal),
+            ("/hal/search", self.hal_search),
+            ("/theses/recherche/", self.theses_fr),
+            ("/theses/these/", self.theses_fr_detail),
+            ("/paperity/search/", self.paperity),
+            ("/universityguru/", self.universityguru),
+            ("/geonames/countryInfoJSON", self.geonames),
+        ]
+        self.server = None
+
+    def count(self, path):
+        with self._lock:
+            self.requests[path] = self.requests.get(path, 0) + 1
+
+    def start(self):
+        self.server = _Server(("127.0.0.1", 0), _Handler)
+        self.server.stub = self
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self.base_url
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server.server_port}"
+
+    def urls(self):
+        """Module constants of src/Main.py and src/UniversityDbCreator.py to point at the stub."""
+        base = self.base_url
+        return {
+            "CROSSREF_URL": f"{base}/crossref/works",
+            "EUTILS_URL": f"{base}/eutils",
+            "HAL_OAI_URL": f"{base}/hal/oai",
+            "HAL_SEARCH_URL": f"{base}/hal/search/",
+            "THESES_FR_URL": f"{base}/theses/recherche/",
+            "THESES_FR_DETAIL_URL": f"{base}/theses/these/",
+            "PAPERITY_URL": f"{base}/paperity/search/",
+            "GEONAMES_URL": f"{base}/geonames/countryInfoJSON",
+            "UNIVERSITYGURU_URL": f"{base}/universityguru",
+        }
+
+    # ---------------- Routes: (path rest, query) -> (body, content type) ----------------
+
+    def crossref(self, rest, query):
+        cursor = query.get("cursor", "*")
+        start = 0 if cursor == "*" else int(cursor)
+        rows = min(int(query.get("rows", 20)), 1000)
+        end = min(start + rows, self.total)
+        items = []
+        for n in range(start, end):
+            item = json.loads(_clone(json.dumps(self.templates["crossref"]), n))
+            items.append(item)
+        message = {"total-results": self.total, "items": items, "next-cursor": str(end), "items-per-page": rows}
+        return json.dumps({"status": "ok", "message": message}), "application/json"
+
+    def eutils(self, rest, query):
+        if rest.startswith("esearch"):
+            result = {"count": str(self.total), "retmax": "0", "retstart": "0",
+                      "querykey": "1", "webenv": "STUB_WEBENV", "idlist": []}
+            return json.dumps({"esearchresult": result}), "application/json"
+        if "id" in query:
+            ids = query["id"].split(",")
+        else:
+            start = int(query.get("retstart", 0))
+            end = min(start + int(query.get("retmax", 20)), self.total)
+            ids = [str(30000000 + n) for n in range(start, end)]
+        if rest.startswith("esummary"):
+            result = {"uids": ids}
+            for uid in ids:
+                result[uid] = json.loads(_clone(self.templates["pubmed_summary"], uid))
+            return json.dumps({"result": result}), "application/json"
+        articles = "".join(_clone(self.templates["pubmed_article"], uid) for uid in ids)
+        return f"<?xml version=\"1.0\"?><PubmedArticleSet>{articles}</PubmedArticleSet>", "text/xml"
+
+    def hal(self, rest, query):
+        page = int(query.get("resumptionToken", 0))
+        start = page * self.page_size
+        records = "".join(_clone(self.templates["hal"], n) for n in range(start, min(start + self.page_size, self.total)))
+        token = str(page + 1) if start + self.page_size < self.total else ""
+        body = ('<?xml version="1.0" encoding="UTF-8"?>'
+                '<OAI-PMH xmlns="http://www.openarchives.org/OAI/2.0/"><ListRecords>'
+                f'{records}<resumptionToken completeListSize="{self.total}">{token}</resumptionToken>'
+                '</ListRecords></OAI-PMH>')
+        return body, "text/xml"
+
+    def hal_search(self, rest, query):
+        # Cursor marks are the offset of the next page; an unchanged mark ends the result set
+        cursor = query.get("cursorMark", "*")
+        start = 0 if cursor == "*" else int(cursor)
+        end = min(start + int(query.get("rows", 30)), self.total)
+        docs = [json.loads(_clone(self.templates["hal_search"], n)) for n in range(start, end)]
+        body = {"response": {"numFound": self.total, "start": 0, "docs": docs}, "nextCursorMark": str(end)}
+        return json.dumps(body), "application/json"
+
+    def theses_fr(self, rest, query):
+        start = int(query.get("debut", query.get("start", 0)))
+        rows = int(query.get("nombre", query.get("rows", self.page_size)))
+        end = min(start + rows, self.total)
+        theses = [json.loads(_clone(self.templates["theses_fr"], n)) for n in range(start, end)]
+        return json.dumps({"totalHits": self.total, "theses": theses}), "application/json"
+
+    def theses_fr_detail(self, rest, query):
+        # rest is the NNT, e.g. 2021UPAS42
+        return _clone(self.templates["theses_fr_detail"], rest.removeprefix("2021UPAS")), "application/json"
+
+    def paperity(self, rest, query):
+        rows = "".join(_clone(self.templates["paperity"], n) for n in range(self.page_size))
+        return f"<html><body><div class=\"container\">{rows}</div></body></html>", "text/html"
+
+    def universityguru(self, rest, query):
+        names = "".join(_clone(self.templates["universityguru"], n) for n in range(self.page_size))
+        return f"<html><body><h1>{rest.upper()}</h1>{names}</body></html>", "text/html"
+
+    def geonames(self, rest, query):
+        countries = [{"countryCode": f"S{n:02d}", "countryName": f"Stubland {n}"} for n in range(self.pages)]
+        return json.dumps({"geonames": countries}), "application/json"
@@ -0,0 +1,202 @@
+import sys
+import os
+import asyncio
+import inspect
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from Main import (
+    SEARCH_PHRASES,
+    ensure_query_string,
+    fetch_hal,
+    fetch_articles_hal,
+    fetch_theses_fr,
+    fetch_crossref,
+    fetch_pubmed,
+    fetch_paperity,
+    fetch_google_scholar,
+    PUBMED_MAX_RECORDS,
+)
+from utils.Database_Calls import open_sink, get_watermark, set_watermark
+from utils.Http_Client import configure_limits
+from utils.Metrics import METRICS, METRICS_FILE
+from ScholarEnricher import ScholarEnricher
+
+# Source name -> fetcher. Every fetcher accepts the phrase list and a sink= keyword.
+SOURCES = {
+    "hal": fetch_hal,
+    "hal_oai": fetch_articles_hal,
+    "theses_fr": fetch_theses_fr,
+    "crossref": fetch_crossref,
+    "pubmed": fetch_pubmed,
+    "paperity": fetch_paperity,
+    "google_scholar": fetch_google_scholar,
+}
+
+# Google Scholar is opt-in: it needs a proxy and is by far the slowest source. So is
+# hal_oai, which harvests a whole OAI-PMH set where hal only downloads matching documents.
+DEFAULT_SOURCES = ["hal", "theses_fr", "crossref", "pubmed", "paperity"]
+
+# Keyword each fetcher takes for its result cap; the others fetch a single page anyway.
+MAX_RESULTS_PARAM = {
+    "hal": "max_results",
+    "hal_oai": "max_records",
+    "theses_fr": "max_results",
+    "crossref": "max_results",
+    "pubmed": "max_results",
+    "google_scholar": "max_results",
+}
+
+# Most records an API will return for one search, whatever cap is asked for. A run
+# that reaches it was truncated like one that reaches its cap.
+API_RECORD_LIMITS = {"pubmed": PUBMED_MAX_RECORDS}
+
+# Sources whose fetcher takes since= (YYYY-MM-DD) and can harvest only what is new.
+# Each keeps a watermark per query in the crawl_state table of the output DB.
+# Thèses.fr is left out: its since= filters on the defence date, so a thesis indexed
+# after the watermark but defended before it would never be fetched. It is
+# re-harvested in full instead, which only re-downloads search pages since details
+# are fetched for new theses only.
+INCREMENTAL_SOURCES = {"hal", "hal_oai", "crossref", "pubmed"}
+
+def _default_arg(func, name):
+    parameter = inspect.signature(func).parameters.get(name) if name else None
+    return None if parameter is None or parameter.default is inspect.Parameter.empty else parameter.default
+
+def _run_fetcher(name, phrases, sink, kwargs, full):
+    """
+    Runs one fetcher in the calling thread, resuming from its watermark unless `full`.
+    The watermark moves to the run's start date only after a complete run
+    whose rows have been flushed: no error (fetchers raise on HTTP errors rather
+    than stop early), and neither the cap nor the API's record limit reached.
+    """
+    incremental = name in INCREMENTAL_SOURCES
+    query_key = ensure_query_string(list(phrases))
+    started = time.strftime("%Y-%m-%d", time.gmtime())
+    since = get_watermark(name, query_key, sink.db_path) if incremental and not full else None
+    if since:
+        kwargs = {**kwargs, "since": since}
+    records = SOURCES[name](phrases, **kwargs) or 0
+    cap_param = MAX_RESULTS_PARAM.get(name)
+    cap = kwargs.get(cap_param, _default_arg(SOURCES[name], cap_param))
+    limits = [limit for limit in (cap, API_RECORD_LIMITS.get(name)) if limit is not None]
+    if incremental and all(records < limit for limit in limits):
+        sink.flush()
+        set_watermark(name, query_key, started, records, sink.db_path)
+    return records, since
+
+async def _run_source(name, phrases, sink, max_results=None, query=None, full=False):
+    """Runs one blocking fetcher in a worker thread and reports how it went."""
+    kwargs = {"sink": sink}
+    if max_results is not None and name in MAX_RESULTS_PARAM:
+        kwargs[MAX_RESULTS_PARAM[name]] = max_results
+    start = time.perf_counter()
+    records, since, error = 0, None, None
+    try:
+        records, since = await asyncio.to_thread(_run_fetcher, name, phrases, sink, kwargs, full)
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+        print(f"❌ {name} failed: {error}")
+    return {
+        "query": query,
+        "source": name,
+        "since": since,
+        "records": records,
+        "seconds": round(time.perf_counter() - start, 3),
+        "error": error,
+    }
+
+def _check_sources(sources):
+    unknown = [s for s in sources if s not in SOURCES]
+    if unknown:
+        raise ValueError(f"Unknown source(s): {', '.join(unknown)}")
+
+async def fetch_queries_async(queries, sources=None, max_results=None, global_limit=8,
+                              per_source_limit=2, source_limits=None, sink=None, full=False):
+    """
+    Runs every (query, source) pair concurrently under one event loop and one set
+    of in-flight limits.
+
+    - queries: phrase lists, or dicts {"name", "phrases", "sources", "max_results"}
+      where "sources" and "max_results" override the arguments below for that query.
+    - sources: names from SOURCES; defaults to DEFAULT_SOURCES.
+    - max_results: optional {source: cap} passed to fetchers that support one.
+    - global_limit / per_source_limit / source_limits: in-flight HTTP request caps,
+      see utils.Http_Client.configure_limits.
+    - sink: optional PaperSink shared by all sources; otherwise one is opened that
+      clusters near-duplicates as it stores (see utils.Near_Duplicates).
+    - full: ignore the watermarks of INCREMENTAL_SOURCES and harvest everything again.
+
+    Returns a run report: {"queries", "records", "seconds", "runs": [per-run dicts]}.
+    """
+    default_sources = list(sources or DEFAULT_SOURCES)
+    runs = []
+    for i, query in enumerate(queries):
+        if not isinstance(query, dict):
+            query = {"phrases": list(query)}
+        name = query.get("name") or f"query-{i + 1}"
+        query_sources = list(query.get("sources") or default_sources)
+        _check_sources(query_sources)
+        caps = {**(max_results or {}), **(query.get("max_results") or {})}
+        runs.extend((name, query["phrases"], source, caps.get(source)) for source in query_sources)
+
+    configure_limits(global_limit, per_source_limit, source_limits)
+    start = time.perf_counter()
+    with open_sink(sink, dedup=True) as sink:
+        # Google Scholar hits are filled in the background while the other sources run;
+        # whatever is left stays queued for the next run or `python src/ScholarEnricher.py`
+        enricher = None
+        if any(source == "google_scholar" for _, _, source, _ in runs):
+            enricher = ScholarEnricher(sink.db_path)
+            enricher.start()
+        try:
+            results = await asyncio.gather(*(
+                _run_source(source, phrases, sink, cap, query=name, full=full)
+                for name, phrases, source, cap in runs
+            ))
+        finally:
+            if enricher is not None:
+                await asyncio.to_thread(enricher.close)
+    return {
+        "queries": list(dict.fromkeys(r["query"] for r in results)),
+        "records": sum(r["records"] for r in results),
+        "seconds": round(time.perf_counter() - start, 3),
+        "runs": results,
+    }
+
+async def fetch_all_async(phrases, sources=None, global_limit=8, per_source_limit=2,
+                          source_limits=None, sink=None, max_results=None, full=False):
+    """
+    Runs the selected sources concurrently for one phrase list.
+
+    Same arguments as fetch_queries_async, with a single query.
+
+    Returns a run report: {"phrases", "records", "seconds", "sources": [per-source dicts]}.
+    """
+    report = await fetch_queries_async([list(phrases)], sources, max_results, global_limit,
+                                       per_source_limit, source_limits, sink, full)
+    return {
+        "phrases": list(phrases),
+        "records": report["records"],
+        "seconds": report["seconds"],
+        "sources": report["runs"],
+    }
+
+def fetch_all(phrases, **kwargs):
+    """Blocking wrapper around fetch_all_async for scripts without an event loop."""
+    return asyncio.run(fetch_all_async(phrases, **kwargs))
+
+def print_report(report):
+    print(f"Fetched {report['records']} records in {report['seconds']:.2f}s")
+    for r in report["sources"]:
+        status = "✅" if r["error"] is None else f"❌ {r['error']}"
+        since = f"  since {r['since']}" if r["since"] else ""
+        print(f"  {r['source']:<15} {r['records']:>6} records  {r['seconds']:>8.2f}s  {status}{since}")
+
+if __name__ == "__main__":
+    METRICS.start_exporter(METRICS_FILE, interval=15)
+    # --full ignores the stored watermarks and re-harvests everything
+    print_report(fetch_all(SEARCH_PHRASES, full="--full" in sys.argv[1:]))
+    METRICS.stop_exporter()
+    print(f"Metrics written to {METRICS_FILE}")
@@ -0,0 +1,145 @@
+"""
+Runs a crawl job file: several query sets against several sources in one process.
+
+    python src/JobRunner.py jobs/example.json
+    python src/JobRunner.py jobs/example.json --db other.db --sources crossref,pubmed
+
+A job file is JSON:
+
+    {
+      "db": "research.db",
+      "sources": ["hal", "theses_fr", "crossref", "pubmed"],
+      "max_results": {"crossref": 2000, "pubmed": 1000, "hal": 500, "theses_fr": 50},
+      "concurrency": {"global": 8, "per_source": 2, "sources": {"pubmed": 1}},
+      "pipeline": {"queue_size": 8, "workers": 2, "processes": false},
+      "queries": [
+        {"name": "adaptation", "phrases": ["Genomic offset", "Plant adaptation"]},
+        {"name": "climate", "phrases": ["Climate change"], "sources": ["crossref"],
+         "max_results": {"crossref": 500}}
+      ]
+    }
+
+Only "queries" is required. A query's "sources" and "max_results" override the
+job-level ones. "pipeline" sizes each fetcher's fetch -> normalize -> store
+stages (see utils.Pipeline.configure_pipeline). Runs are incremental: HAL, Crossref and PubMed only
+fetch records newer than their last complete run of the same query, unless
+--full is given. Every (query, source) run shares one scheduler, one set of
+in-flight limits and one database writer, which also clusters the same paper
+arriving from several sources (see utils/Near_Duplicates.py).
+"""
+import sys
+import os
+import json
+import argparse
+import asyncio
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from FetchEngine import SOURCES, DEFAULT_SOURCES, fetch_queries_async
+from utils.Database_Calls import DB_PATH, create_database, PaperSink
+from utils.Metrics import METRICS
+from utils.Pipeline import configure_pipeline
+
+def load_job(path):
+    """Reads and checks a job file; raises ValueError on anything it can't run."""
+    with open(path, "r", encoding="utf-8") as f:
+        job = json.load(f)
+    queries = job.get("queries")
+    if not queries:
+        raise ValueError(f"{path}: a job needs a non-empty \"queries\" list")
+    for i, query in enumerate(queries):
+        phrases = query.get("phrases") if isinstance(query, dict) else None
+        if not phrases or not isinstance(phrases, list):
+            raise ValueError(f"{path}: query {i + 1} needs a \"phrases\" list")
+    used = set(job.get("sources") or DEFAULT_SOURCES)
+    used.update(s for q in queries for s in q.get("sources") or ())
+    used.update(job.get("max_results") or {})
+    unknown = sorted(used - set(SOURCES))
+    if unknown:
+        raise ValueError(f"{path}: unknown source(s): {', '.join(unknown)}")
+    return job
+
+def run_job(job, db_path=None, sources=None, full=False):
+    """
+    Runs every query of `job` and returns the run report of
+    FetchEngine.fetch_queries_async. `db_path` and `sources` override the job file.
+
+    Sources that support it only fetch what is new since their last complete run
+    for the same query; full=True re-harvests everything.
+    """
+    db_path = db_path or job.get("db") or DB_PATH
+    concurrency = job.get("concurrency") or {}
+    configure_pipeline(**(job.get("pipeline") or {}))
+    create_database(db_path)
+    with PaperSink(db_path, dedup=True) as sink:
+        return asyncio.run(fetch_queries_async(
+            job["queries"],
+            sources=sources or job.get("sources"),
+            max_results=job.get("max_results"),
+            global_limit=concurrency.get("global", 8),
+            per_source_limit=concurrency.get("per_source", 2),
+            source_limits=concurrency.get("sources"),
+            sink=sink,
+            full=full,
+        ))
+
+def summarize_by_source(report):
+    """Per-source totals of a run report, with HTTP counts taken from METRICS."""
+    summary = {}
+    for run in report["runs"]:
+        s = summary.setdefault(run["source"], {"runs": 0, "records": 0, "seconds": 0.0, "errors": 0,
+                                               "requests": 0, "bytes": 0, "retries": 0})
+        s["runs"] += 1
+        s["records"] += run["records"]
+        s["seconds"] = max(s["seconds"], run["seconds"])
+        s["errors"] += run["error"] is not None
+    http_counters = {"http_requests_total": "requests", "http_response_bytes_total": "bytes",
+                     "http_retries_total": "retries"}
+    busy = {}
+    for counter in METRICS.snapshot()["counters"]:
+        field = http_counters.get(counter["name"])
+        source = counter["labels"].get("source")
+        if field and source in summary:
+            summary[source][field] += counter["value"]
+        if counter["name"] == "pipeline_busy_seconds" and counter["labels"].get("pipeline") in summary:
+            stages = busy.setdefault(counter["labels"]["pipeline"], {})
+            stages[counter["labels"]["stage"]] = counter["value"]
+    for source, s in summary.items():
+        # The pipeline stage that spent the most time working: fetch, normalize or store
+        s["bottleneck"] = max(busy[source], key=busy[source].get) if source in busy else None
+    return summary
+
+def print_summary(report):
+    print(f"Fetched {report['records']} records for {len(report['queries'])} queries in {report['seconds']:.2f}s")
+    print(f"  {'source':<15} {'runs':>4} {'records':>8} {'requests':>8} {'MB':>8} {'retries':>7} {'slowest':>9} "
+          f"{'bottleneck':>10}")
+    for source, s in summarize_by_source(report).items():
+        status = "✅" if not s["errors"] else f"❌ {s['errors']} failed"
+        print(f"  {source:<15} {s['runs']:>4} {s['records']:>8} {s['requests']:>8} "
+              f"{s['bytes'] / 1e6:>8.2f} {s['retries']:>7} {s['seconds']:>8.2f}s {s['bottleneck'] or '-':>10}  {status}")
+    incremental = [r for r in report["runs"] if r["since"]]
+    if incremental:
+        print(f"  {len(incremental)} of {len(report['runs'])} runs fetched only records since their last run "
+              f"(--full to re-harvest)")
+    for run in report["runs"]:
+        if run["error"]:
+            print(f"  ❌ {run['query']} / {run['source']}: {run['error']}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a crawl job file.")
+    parser.add_argument("job", help="JSON job file (see the module docstring)")
+    parser.add_argument("--db", help="output database (overrides the job file)")
+    parser.add_argument("--sources", help="comma-separated sources (overrides the job file)")
+    parser.add_argument("--full", action="store_true",
+                        help="ignore the stored watermarks and re-harvest everything")
+    parser.add_argument("--metrics", help="write a metrics snapshot here every 15 s (.json or Prometheus text)")
+    args = parser.parse_args()
+
+    job = load_job(args.job)
+    if args.metrics:
+        METRICS.start_exporter(args.metrics, interval=15)
+    report = run_job(job, db_path=args.db, sources=args.sources.split(",") if args.sources else None,
+                     full=args.full)
+    if args.metrics:
+        METRICS.stop_exporter()
+    print_summary(report)
@@ -2,55 +2,29 @@ import sys
 import os
 import requests
 import time
-import tracemalloc
-import random
+import contextlib
+import functools
+import itertools
+import re
 import urllib.parse
 import xml.etree.ElementTree as ET
 from scholarly import scholarly, ProxyGenerator
 from scholarly._proxy_generator import MaxTriesExceededException
-from bs4 import BeautifulSoup
-from tqdm import tqdm
-from fake_useragent import UserAgent
 import sqlite3
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 
 # Append parent directory if needed
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-# ---------------- Database Functions ----------------
-
-def insert_paper(title, authors, year, source, link, abstract, keywords, citations=0):
-    conn = sqlite3.connect("research.db")
-    cursor = conn.cursor()
-    cursor.execute('''
-        INSERT INTO papers (title, authors, year, source, link, abstract, keywords, citations)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-    ''', (title, authors, year, source, link, abstract, keywords, citations))
-    conn.commit()
-    conn.close()
-
-def remove_duplicates_from_db():
-    conn = sqlite3.connect("research.db")
-    cursor = conn.cursor()
-    query = """
-    DELETE FROM papers
-    WHERE rowid NOT IN (
-        SELECT MIN(rowid)
-        FROM papers
-        GROUP BY title, authors, source
-    );
-    """
-    cursor.execute(query)
-    conn.commit()
-    conn.close()
-    print("Duplicates removed successfully!")
-
-def search_papers(keyword):
-    conn = sqlite3.connect("research.db")
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM papers WHERE title LIKE ?", ('%' + keyword + '%',))
-    results = cursor.fetchall()
-    conn.close()
-    return results
+from utils.Database_Calls import (DB_PATH, PaperSink, open_sink, search_papers, paper_identity_key,
+                                  stored_links)
+from utils.Proxies import PROXY_POOL
+from utils.Http_Client import get as http_get, random_user_agent
+from utils.Rate_Limit import RATE_LIMITER
+from utils.Metrics import METRICS, METRICS_FILE, trace_memory
+from utils.Html_Parsers import parse_paperity
+from utils.Pipeline import PaperRecord, run_paper_pipeline
+from ScholarEnricher import ensure_enrichment_queue, enqueue_enrichment, SCHOLARLY_LOCK, use_scholarly_proxy
 
 # ---------------- Helper Functions for Query Handling ----------------
 
@@ -66,14 +40,15 @@ def ensure_query_string(query):
 def build_hal_query_from_phrases(phrases):
     """
     Given a list of phrases (e.g. ["Genomic offset", "Plant adaptation", "Climate change"]),
-    build a Solr query that searches for these phrases (exact match) in either the title_s or abstract_s field.
-    
+    build a Solr query that searches for these phrases (exact match) in either the title_t or abstract_t field.
+
+    The _t fields are HAL's tokenized text fields; the _s ones only match a whole title.
     The resulting query will look like:
-      (title_s:("Genomic offset") OR title_s:("Plant adaptation") OR title_s:("Climate change") OR
-       abstract_s:("Genomic offset") OR abstract_s:("Plant adaptation") OR abstract_s:("Climate change"))
+      (title_t:("Genomic offset") OR title_t:("Plant adaptation") OR title_t:("Climate change") OR
+       abstract_t:("Genomic offset") OR abstract_t:("Plant adaptation") OR abstract_t:("Climate change"))
     """
-    title_queries = [f'title_s:("{phrase}")' for phrase in phrases]
-    abstract_queries = [f'abstract_s:("{phrase}")' for phrase in phrases]
+    title_queries = [f'title_t:("{phrase}")' for phrase in phrases]
+    abstract_queries = [f'abstract_t:("{phrase}")' for phrase in phrases]
     combined = " OR ".join(title_queries + abstract_queries)
     return f"({combined})"
 
@@ -107,338 +82,797 @@ def format_author(author: dict) -> str:
 
 # ---------------- Performance Measurement ----------------
 
-def measure_performance(func, *args):
-    start_time = time.time()
-    tracemalloc.start()
-    result = func(*args)
-    current, peak = tracemalloc.get_traced_memory()
-    tracemalloc.stop()
-    end_time = time.time()
-    print(f"Function {func.__name__} took {end_time - start_time:.4f} seconds to execute.")
-    print(f"Current memory usage: {current / 10**6:.4f} MB; Peak memory usage: {peak / 10**6:.4f} MB")
+# tracemalloc slows a run down noticeably, so memory tracing is opt-in
+TRACE_MEMORY = os.environ.get("TRACE_MEMORY") == "1"
+
+def measure_performance(func, *args, memory=TRACE_MEMORY, **kwargs):
+    """
+    Runs `func` and records its duration, and its record count if it returns one,
+    in METRICS under fetcher=<function name>. memory=True also records the peak
+    traced memory (see utils.Metrics.trace_memory).
+    """
+    name = func.__name__
+    start = time.perf_counter()
+    with trace_memory(fetcher=name) if memory else contextlib.nullcontext():
+        result = func(*args, **kwargs)
+    METRICS.observe("fetch_seconds", time.perf_counter() - start, fetcher=name)
+    if isinstance(result, int):
+        METRICS.inc("fetch_records_total", result, fetcher=name)
     return result
 
 # ---------------- API/Scraper Functions ----------------
 
-def fetch_google_scholar(query):
+# scholarly makes its own requests, so its pacing goes through the limiter by hand
+SCHOLAR_HOST = "scholar.google.com"
+# Hits per Google Scholar results page
+SCHOLAR_PAGE_SIZE = 10
+
+def fetch_google_scholar(query, sink=None, max_results=None):
+    """
+    Stores Google Scholar hits for `query` straight from the search pages.
+
+    Hits are not filled inline (one extra request each); they are queued for
+    ScholarEnricher, which fills them in the background or in a later run.
+    Proxy switches and result pages hold SCHOLARLY_LOCK, as scholarly's
+    navigator is shared with the enricher.
+
+    Returns:
+      Number of stored hits.
+    """
     query_str = ensure_query_string(query)
-    pg = ProxyGenerator()
     for _ in range(3):
-        proxy = None  # Replace with get_proxy() if available
+        proxy = PROXY_POOL.get_proxy()
         if proxy:
+            # A fresh generator per attempt, so use_scholarly_proxy sees the switch
+            pg = ProxyGenerator()
             pg.SingleProxy(http=proxy["http"], https=proxy["https"])
-            scholarly.use_proxy(pg)
         else:
             print("⚠️ No proxies available. Skipping Google Scholar.")
-            return
+            return 0
         try:
-            search_query = scholarly.search_pubs(f'"{query_str}"')
+            with SCHOLARLY_LOCK:
+                use_scholarly_proxy(pg)
+                search_query = scholarly.search_pubs(f'"{query_str}"')
             count = 0
-            for result in search_query:
-                paper = scholarly.fill(result)
-                insert_paper(
-                    title=paper.get("bib", {}).get("title", "Unknown"),
-                    authors=", ".join(paper.get("bib", {}).get("author", ["Unknown"])),
-                    year=paper.get("bib", {}).get("pub_year", None),
-                    source="Google Scholar",
-                    link=paper.get("pub_url", ""),
-                    abstract=paper.get("bib", {}).get("abstract", ""),
-                    keywords=query_str,
-                    citations=paper.get("num_citations", 0)
-                )
-                count += 1
-                time.sleep(random.uniform(2, 5))
-            print(f"✅ Google Scholar fetched {count} results.")
-            return
+            with open_sink(sink) as sink, contextlib.closing(sqlite3.connect(sink.db_path)) as queue:
+                ensure_enrichment_queue(queue)
+                queued = []
+                while True:
+                    if count % SCHOLAR_PAGE_SIZE == 0:
+                        # scholarly loads the next page of results here
+                        RATE_LIMITER.acquire(SCHOLAR_HOST, "google_scholar")
+                    with SCHOLARLY_LOCK:
+                        # Fetching a page must not overlap an enricher proxy switch or fill
+                        use_scholarly_proxy(pg)
+                        result = next(search_query, None)
+                    if result is None:
+                        break
+                    bib = result.get("bib", {})
+                    paper = dict(
+                        title=bib.get("title", "Unknown"),
+                        authors=", ".join(bib.get("author", ["Unknown"])),
+                        year=bib.get("pub_year", None),
+                        source="Google Scholar",
+                        link=result.get("pub_url", ""),
+                        abstract=bib.get("abstract", ""),
+                        keywords=query_str,
+                        citations=result.get("num_citations", 0)
+                    )
+                    sink.add(**paper)
+                    queued.append((paper_identity_key(paper["title"], paper["authors"], paper["year"], paper["link"]),
+                                   result))
+                    count += 1
+                    if len(queued) >= SCHOLAR_PAGE_SIZE:
+                        # The rows must exist before the enricher can update them
+                        sink.flush()
+                        with queue:
+                            enqueue_enrichment(queue, queued)
+                        queued = []
+                    if max_results is not None and count >= max_results:
+                        break
+                sink.flush()
+                with queue:
+                    enqueue_enrichment(queue, queued)
+            print(f"✅ Google Scholar fetched {count} results; queued for enrichment.")
+            return count
         except MaxTriesExceededException:
             print("❌ Google Scholar blocked request. Retrying...")
+            RATE_LIMITER.feedback(SCHOLAR_HOST, 429)
+            PROXY_POOL.report_failure(proxy)
             continue
     print("❌ Google Scholar failed after maximum retries.")
+    return 0
 
-def fetch_crossref(query):
-    query_str = ensure_query_string(query)
-    base_url = "https://api.crossref.org/works"
-    params = {"query": query_str, "rows": 20}
-    response = requests.get(base_url, params=params)
-    if response.status_code == 200:
-        data = response.json()
-        items = data["message"]["items"]
-        print(f"Crossref found {len(items)} results.")
-        for item in items:
-            title = item.get("title", ["Unknown"])[0]
-            authors = ", ".join([f'{author.get("given", "Unknown")} {author.get("family", "Unknown")}' for author in item.get("author", [])])
-            year = item.get("published-print", {}).get("date-parts", [[None]])[0][0]
-            link = item.get("URL", "")
-            insert_paper(
-                title=title,
-                authors=authors,
-                year=year,
-                source="Crossref",
-                link=link,
-                abstract="",
-                keywords=query_str,
-                citations=0
-            )
-    else:
-        print(f"Crossref request failed with status code {response.status_code}")
+CROSSREF_URL = "https://api.crossref.org/works"
+# Contact address sent with Crossref requests to get routed to the "polite" pool
+CROSSREF_MAILTO = os.environ.get("CROSSREF_MAILTO")
+# Only the fields we store are requested
+CROSSREF_FIELDS = ["DOI", "title", "author", "published-print", "issued", "URL", "abstract", "is-referenced-by-count"]
+
+def _crossref_year(item):
+    for field in ("published-print", "issued"):
+        year = (item.get(field, {}).get("date-parts") or [[None]])[0][0]
+        if year:
+            return year
+    return None
+
+def _strip_jats(text):
+    """Crossref abstracts are JATS XML fragments; keep only the text."""
+    return re.sub(r"\s+", " ", re.sub(r"<[^>]+>", " ", text or "")).strip()
+
+def iter_crossref_pages(query_str, max_results=None, rows=1000, mailto=None, since=None):
+    """
+    Yields the raw item lists of successive Crossref cursor pages for `query_str`.
 
-def fetch_pubmed(query):
+    Pages of `rows` items (1000 is the API maximum) are requested with cursor=*
+    and select= limited to CROSSREF_FIELDS. `mailto` (or CROSSREF_MAILTO) is sent
+    in the User-Agent and as a parameter so requests go to Crossref's polite pool.
+    `since` (YYYY-MM-DD) keeps only works indexed on or after that date
+    (from-index-date filter).
+    """
+    mailto = mailto or CROSSREF_MAILTO
+    params = {"query": query_str, "rows": rows, "cursor": "*", "select": ",".join(CROSSREF_FIELDS)}
+    if since:
+        params["filter"] = f"from-index-date:{since}"
+    headers = {}
+    if mailto:
+        params["mailto"] = mailto
+        headers["User-Agent"] = f"SimpleScrawler (mailto:{mailto})"
+
+    fetched, total = 0, 0
+    while True:
+        if max_results is not None:
+            params["rows"] = min(rows, max_results - fetched)
+        # Cursors expire after a few minutes, so cursor pages are never served from the cache
+        response = http_get(CROSSREF_URL, source="crossref", params=params, headers=headers, cache=False)
+        if response.status_code != 200:
+            # Raising, rather than stopping early, keeps the watermark from moving past unfetched pages
+            raise requests.HTTPError(f"Crossref request failed with status code {response.status_code}",
+                                     response=response)
+        with METRICS.timer("parse_seconds", source="crossref"):
+            message = response.json()["message"]
+        items = message.get("items", [])
+        if params["cursor"] == "*":
+            total = message.get("total-results", 0)
+            print(f"Crossref found {total} results.")
+        if items:
+            yield items
+        fetched += len(items)
+        next_cursor = message.get("next-cursor")
+        if (not items or not next_cursor or fetched >= total
+                or (max_results is not None and fetched >= max_results)):
+            break
+        params["cursor"] = next_cursor
+
+def normalize_crossref_page(items, keywords):
+    """Maps one page of Crossref items to PaperRecords."""
+    return [PaperRecord(
+        title=(item.get("title") or ["Unknown"])[0],
+        authors=", ".join([f'{author.get("given", "Unknown")} {author.get("family", "Unknown")}' for author in item.get("author", [])]),
+        year=_crossref_year(item),
+        source="Crossref",
+        link=item.get("URL", ""),
+        abstract=_strip_jats(item.get("abstract")),
+        keywords=keywords,
+        citations=item.get("is-referenced-by-count", 0),
+        doi=item.get("DOI")
+    ) for item in items]
+
+def fetch_crossref(query, sink=None, max_results=None, rows=1000, mailto=None, since=None):
+    """
+    Harvests Crossref works matching `query` with deep cursor paging (see
+    iter_crossref_pages). Pages are fetched, normalized and written in separate
+    pipeline stages, so the next page is requested while the last one is stored.
+
+    Returns:
+      Number of stored records.
+    """
     query_str = ensure_query_string(query)
-    base_url = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/esearch.fcgi"
-    params = {
-        "db": "pubmed",
-        "term": query_str,
-        "retmode": "json",
-        "retmax": 100
-    }
-    response = requests.get(base_url, params=params)
-    if response.status_code == 200:
-        ids = response.json().get("esearchresult", {}).get("idlist", [])
-        print(f"PubMed found {len(ids)} results.")
-        for pubmed_id in ids:
-            fetch_pubmed_details(pubmed_id)
-    else:
-        print(f"PubMed request failed with status code {response.status_code}")
+    with open_sink(sink) as sink:
+        return run_paper_pipeline("crossref", iter_crossref_pages(query_str, max_results, rows, mailto, since),
+                                  functools.partial(normalize_crossref_page, keywords=query_str), sink)
 
-def fetch_pubmed_details(pubmed_id):
-    details_url = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/esummary.fcgi"
-    params = {"db": "pubmed", "id": pubmed_id, "retmode": "json"}
-    response = requests.get(details_url, params=params)
-    if response.status_code == 200:
-        summary = response.json().get("result", {}).get(pubmed_id, {})
-        insert_paper(
+EUTILS_URL = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils"
+# NCBI allows 3 requests/s without an API key and 10/s with one
+NCBI_API_KEY = os.environ.get("NCBI_API_KEY")
+# esearch/esummary will not page past the first 10,000 hits of a search
+PUBMED_MAX_RECORDS = 10000
+
+def _ncbi_get(endpoint, params, api_key=None):
+    """GET an E-utilities endpoint; pacing comes from the shared per-host rate limiter."""
+    api_key = api_key or NCBI_API_KEY
+    if api_key:
+        params = {**params, "api_key": api_key}
+    return http_get(f"{EUTILS_URL}/{endpoint}", source="pubmed", params=params)
+
+def _pubmed_efetch(history, retstart, retmax, api_key=None):
+    """Raw efetch XML of one page of the search history; raises requests.HTTPError if the request failed."""
+    params = {**history, "db": "pubmed", "retstart": retstart, "retmax": retmax,
+              "rettype": "abstract", "retmode": "xml"}
+    response = _ncbi_get("efetch.fcgi", params, api_key)
+    if response.status_code != 200:
+        raise requests.HTTPError(f"PubMed efetch failed at {retstart} with status code {response.status_code}",
+                                 response=response)
+    return response.content
+
+def _parse_pubmed_abstracts(content):
+    """Returns {pmid: abstract} from an efetch XML page."""
+    abstracts = {}
+    with METRICS.timer("parse_seconds", source="pubmed"):
+        for article in ET.fromstring(content).iter("PubmedArticle"):
+            pmid = article.findtext("MedlineCitation/PMID")
+            parts = [("".join(el.itertext())).strip()
+                     for el in article.iterfind("MedlineCitation/Article/Abstract/AbstractText")]
+            if pmid:
+                abstracts[pmid] = " ".join(p for p in parts if p)
+    return abstracts
+
+def _pubmed_records(result, abstracts=None):
+    """Maps every summary of an esummary `result` block to a PaperRecord."""
+    records = []
+    for pubmed_id in result.get("uids", []):
+        summary = result.get(pubmed_id, {})
+        records.append(PaperRecord(
             title=summary.get("title", "Unknown"),
             authors=", ".join([author.get("name", "Unknown") for author in summary.get("authors", [])]),
             year=summary.get("pubdate", "").split(" ")[0],
             source="PubMed",
             link=f"https://pubmed.ncbi.nlm.nih.gov/{pubmed_id}",
-            abstract=summary.get("source", ""),
+            abstract=abstracts.get(pubmed_id, "") if abstracts is not None else summary.get("source", ""),
             keywords=str(pubmed_id),
             citations=0
-        )
+        ))
+    return records
+
+def normalize_pubmed_page(page):
+    """Maps one (esummary result, efetch XML or None) page to PaperRecords."""
+    result, efetch_xml = page
+    return _pubmed_records(result, _parse_pubmed_abstracts(efetch_xml) if efetch_xml is not None else None)
+
+def iter_pubmed_pages(query_str, max_results=None, batch_size=200, fetch_abstracts=False, api_key=None,
+                      since=None):
+    """
+    Yields raw (esummary result, efetch XML or None) pages of every PubMed hit for
+    `query_str`; see fetch_pubmed.
+    """
+    if api_key or NCBI_API_KEY:
+        RATE_LIMITER.configure(urllib.parse.urlsplit(EUTILS_URL).netloc, "pubmed", rate=10, max_rate=10)
+    params = {
+        "db": "pubmed",
+        "term": query_str,
+        "retmode": "json",
+        "retmax": 0,
+        "usehistory": "y"
+    }
+    if since:
+        # mindate needs a maxdate to go with it
+        params.update(datetype="edat", mindate=since.replace("-", "/"), maxdate=time.strftime("%Y/%m/%d"))
+    response = _ncbi_get("esearch.fcgi", params, api_key)
+    if response.status_code != 200:
+        raise requests.HTTPError(f"PubMed request failed with status code {response.status_code}",
+                                 response=response)
+    search = response.json().get("esearchresult", {})
+    count = int(search.get("count", 0))
+    history = {"WebEnv": search.get("webenv"), "query_key": search.get("querykey")}
+    total = min(count, max_results or count, PUBMED_MAX_RECORDS)
+    print(f"PubMed found {count} results, harvesting {total}.")
+
+    for retstart in range(0, total, batch_size):
+        retmax = min(batch_size, total - retstart)
+        params = {**history, "db": "pubmed", "retstart": retstart, "retmax": retmax, "retmode": "json"}
+        response = _ncbi_get("esummary.fcgi", params, api_key)
+        if response.status_code != 200:
+            raise requests.HTTPError(f"PubMed esummary failed at {retstart} with status code "
+                                     f"{response.status_code}", response=response)
+        efetch_xml = _pubmed_efetch(history, retstart, retmax, api_key) if fetch_abstracts else None
+        with METRICS.timer("parse_seconds", source="pubmed"):
+            result = response.json().get("result", {})
+        yield result, efetch_xml
 
-def fetch_paperity(query):
+def fetch_pubmed(query, sink=None, max_results=None, batch_size=200, fetch_abstracts=False, api_key=None,
+                 since=None):
+    """
+    Harvests every PubMed hit for `query` using the E-utilities history server.
+
+    One esearch (usehistory=y) stores the result set on NCBI's side, then esummary
+    (and efetch when fetch_abstracts=True) page through it `batch_size` IDs at a time.
+    Requests are paced to 3/s, or 10/s when an API key is given or NCBI_API_KEY is set.
+    Abstract XML is parsed in the normalize stage of the pipeline, off the fetch thread.
+
+    - max_results: stop after this many records (NCBI caps searches at 10,000).
+    - fetch_abstracts: store the real abstract from efetch instead of the journal name.
+    - since: YYYY-MM-DD; only records added to PubMed on or after that date (Entrez date).
+
+    Returns:
+      Number of stored records.
+    """
     query_str = ensure_query_string(query)
-    base_url = "https://paperity.org/search/"
+    pages = iter_pubmed_pages(query_str, max_results, batch_size, fetch_abstracts, api_key, since)
+    with open_sink(sink) as sink:
+        return run_paper_pipeline("pubmed", pages, normalize_pubmed_page, sink)
+
+def fetch_pubmed_details(pubmed_id, sink=None):
+    params = {"db": "pubmed", "id": pubmed_id, "retmode": "json"}
+    response = _ncbi_get("esummary.fcgi", params)
+    if response.status_code == 200:
+        with open_sink(sink) as sink:
+            for record in _pubmed_records(response.json().get("result", {})):
+                sink.add(*record.astuple())
+
+PAPERITY_URL = "https://paperity.org/search/"
+
+def iter_paperity_pages(query_str):
+    """Yields the HTML of the Paperity search page for `query_str`, retrying blocked requests."""
+    base_url = PAPERITY_URL
     formatted_query = query_str.replace(" ", "+")
     search_url = f"{base_url}?q=\"{formatted_query}\""
     for _ in range(3):
         proxy = None  # Replace with get_proxy() if available
         headers = {
-            "User-Agent": UserAgent().random,
+            "User-Agent": random_user_agent(),
             "Referer": "https://paperity.org/",
         }
         try:
-            response = requests.get(search_url, headers=headers, proxies=proxy, timeout=10)
+            response = http_get(search_url, source="paperity", headers=headers, proxies=proxy)
             if response.status_code == 403:
                 print(f"❌ Paperity blocked proxy {proxy}. Retrying...")
                 continue
             if response.status_code != 200:
                 print(f"⚠️ Paperity request failed with status code {response.status_code}.")
                 return
-            soup = BeautifulSoup(response.text, "html.parser")
-            articles = soup.find_all("div", class_="row")
-            if not articles:
-                print("⚠️ No results found on Paperity. Possible structure change.")
-                return
-            print(f"✅ Paperity found {len(articles)} results.")
-            for article in tqdm(articles, desc="Fetching Paperity papers"):
-                title_element = article.find("h2", class_="paper-list-title")
-                link_element = title_element.find("a") if title_element else None
-                title = title_element.get_text(strip=True) if title_element else "Unknown"
-                link = f"https://paperity.org{link_element['href']}" if link_element else ""
-                author_element = article.find("p", class_="bib-authors")
-                authors = author_element.get_text(strip=True) if author_element else "Unknown"
-                date_element = article.find("p", class_="bib-date")
-                publication_date = date_element.get_text(strip=True) if date_element else "Unknown"
-                insert_paper(
-                    title=title,
-                    authors=authors,
-                    year=publication_date,
-                    source="Paperity",
-                    link=link,
-                    abstract="",
-                    keywords=query_str,
-                    citations=0
-                )
+            yield response.text
             return
         except requests.exceptions.RequestException:
             print(f"❌ Paperity proxy {proxy} failed. Retrying...")
             continue
     print("❌ Paperity failed after maximum retries.")
 
-def fetch_theses_fr(query, max_results=50):
-    # For Thèses.fr, if query is not a list, convert it to a list.
-    if not isinstance(query, list):
-        query_phrases = [query]
-    else:
-        query_phrases = query
-    q_param = build_theses_fr_query_phrases(query_phrases)
-    base_url = "https://theses.fr/api/v1/theses/recherche/"
-    params = {
-        "q": q_param,
-        "rows": max_results
-    }
-    headers = {
-        "User-Agent": UserAgent().random,
+def normalize_paperity_page(html, keywords):
+    """Parses one Paperity search page into PaperRecords."""
+    with METRICS.timer("parse_seconds", source="paperity"):
+        articles = parse_paperity(html)
+    if not articles:
+        print("⚠️ No results found on Paperity. Possible structure change.")
+        return []
+    print(f"✅ Paperity found {len(articles)} results.")
+    return [PaperRecord(
+        title=article["title"],
+        authors=article["authors"],
+        year=article["date"],
+        source="Paperity",
+        link=f"https://paperity.org{article['href']}" if article["href"] else "",
+        abstract="",
+        keywords=keywords,
+        citations=0
+    ) for article in articles]
+
+def fetch_paperity(query, sink=None):
+    query_str = ensure_query_string(query)
+    with open_sink(sink) as sink:
+        return run_paper_pipeline("paperity", iter_paperity_pages(query_str),
+                                  functools.partial(normalize_paperity_page, keywords=query_str), sink)
+
+THESES_FR_URL = "https://theses.fr/api/v1/theses/recherche/"
+THESES_FR_DETAIL_URL = "https://theses.fr/api/v1/theses/these/"
+# Theses per search page (nombre=)
+THESES_FR_PAGE_SIZE = 100
+# Search pages and thesis details requested at once
+THESES_FR_CONCURRENCY = 4
+
+def _theses_fr_headers():
+    return {
+        "User-Agent": random_user_agent(),
         "Accept": "application/json",
         "Referer": "https://theses.fr/"
     }
-    print(f"[Thèses.fr REST] Debug: Requesting REST API with params={params}")
-    response = requests.get(base_url, params=params, headers=headers, timeout=10)
+
+def _theses_fr_link(thesis):
+    nnt = thesis.get("nnt", "")
+    return f"https://www.theses.fr/{nnt}" if nnt else thesis.get("url", "")
+
+def _theses_fr_search(q_param, start, rows, headers):
+    """One page of search results: `rows` theses from offset `start`."""
+    params = {"q": q_param, "debut": start, "nombre": rows}
+    response = http_get(THESES_FR_URL, source="theses_fr", params=params, headers=headers)
     response.raise_for_status()
-    data = response.json()
-    print(f"[Thèses.fr REST] Response keys: {list(data.keys())}")
+    with METRICS.timer("parse_seconds", source="theses_fr"):
+        return response.json()
+
+def _theses_fr_detail(nnt, headers):
+    """The full record of one thesis, or None if the request failed."""
+    response = http_get(THESES_FR_DETAIL_URL + nnt, source="theses_fr", headers=headers)
+    if response.status_code != 200:
+        print(f"[Thèses.fr REST] Detail of {nnt} failed with status code {response.status_code}")
+        return None
+    with METRICS.timer("parse_seconds", source="theses_fr"):
+        return response.json()
+
+def _add_theses_fr_details(theses, pool, headers, db_path):
+    """Stores the full record of every thesis not yet in `db_path` under thesis["detail"]."""
+    stored = stored_links([_theses_fr_link(t) for t in theses], db_path)
+    new = [t for t in theses if t.get("nnt") and _theses_fr_link(t) not in stored]
+    for thesis, detail in zip(new, pool.map(lambda t: _theses_fr_detail(t["nnt"], headers), new)):
+        if detail:
+            thesis["detail"] = detail
+    return theses
+
+def iter_theses_fr_pages(q_param, max_results=None, page_size=THESES_FR_PAGE_SIZE,
+                         concurrency=THESES_FR_CONCURRENCY, details=True, db_path=DB_PATH):
+    """
+    Yields the raw thesis lists of every Thèses.fr hit for `q_param`, at most
+    `max_results` of them.
+
+    The first page gives the number of hits; the other pages are requested by
+    offset (debut=), `concurrency` at a time, and yielded as they arrive, so
+    their order is not the API's. With `details`, theses whose link is not in
+    `db_path` yet also get their full record (see normalize_theses_fr_page).
+    """
+    headers = _theses_fr_headers()
+    first_rows = page_size if max_results is None else min(page_size, max_results)
+    data = _theses_fr_search(q_param, 0, first_rows, headers)
     total_hits = data.get("totalHits", 0)
-    print(f"[Thèses.fr REST] Total hits: {total_hits}")
-    theses_list = data.get("theses", [])
-    print(f"[Thèses.fr REST] Found {len(theses_list)} record(s).")
+    wanted = total_hits if max_results is None else min(total_hits, max_results)
+    print(f"[Thèses.fr REST] Total hits: {total_hits}, fetching {wanted}")
+    offsets = iter(range(first_rows, wanted, page_size))
+    pool = ThreadPoolExecutor(max_workers=concurrency)
+    try:
+        pages = [data]
+        pending = set()
+        while pages or pending:
+            # Only `concurrency` pages are requested ahead, so a slow writer holds back the downloads
+            for start in itertools.islice(offsets, concurrency - len(pending)):
+                pending.add(pool.submit(_theses_fr_search, q_param, start, min(page_size, wanted - start), headers))
+            if not pages:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                pages = [future.result() for future in finished]
+            theses = pages.pop().get("theses", [])
+            if details and theses:
+                theses = _add_theses_fr_details(theses, pool, headers, db_path)
+            if theses:
+                yield theses
+    finally:
+        pool.shutdown(cancel_futures=True)
+
+def _theses_fr_abstract(record):
+    """French abstract of a search hit or full record, else the English one."""
+    resumes = record.get("resumes") or {}
+    if isinstance(resumes, list):
+        resumes = {r.get("langue"): r.get("texte") for r in resumes if isinstance(r, dict)}
+    return resumes.get("fr") or resumes.get("en") or ""
+
+def _theses_fr_subjects(detail):
+    """Subject headings of a full thesis record, French first, without repeats."""
+    subjects = detail.get("sujets") or []
+    if isinstance(subjects, dict):
+        subjects = [s for lang in ("fr", "en") for s in subjects.get(lang) or []]
+    names = []
+    for subject in [*subjects, *(detail.get("sujetsRameau") or [])]:
+        name = subject.get("libelle") if isinstance(subject, dict) else subject
+        if name and name not in names:
+            names.append(name)
+    return names
+
+def normalize_theses_fr_page(theses_list, keywords):
+    """
+    Maps one page of Thèses.fr results to PaperRecords. A thesis fetched with its
+    full record gets the longer abstract, and its subjects added to `keywords`.
+    """
+    records = []
     for thesis in theses_list:
         title = thesis.get("titrePrincipal", "Unknown Title")
         authors_data = thesis.get("auteurs", [])
         authors = ", ".join(format_author(a) for a in authors_data) if authors_data else "Unknown Author"
         date_soutenance = thesis.get("dateSoutenance") or "Unknown Date"
         year = date_soutenance.split("-")[0] if date_soutenance != "Unknown Date" else "Unknown"
-        nnt = thesis.get("nnt", "")
-        link = f"https://www.theses.fr/{nnt}" if nnt else thesis.get("url", "")
-        abstract = thesis.get("resumes", {}).get("fr", "")
-        keywords = ensure_query_string(query) if not isinstance(query, list) else " OR ".join(query)
-        insert_paper(
+        detail = thesis.get("detail") or {}
+        abstract = max(_theses_fr_abstract(thesis), _theses_fr_abstract(detail), key=len)
+        subjects = _theses_fr_subjects(detail)
+        records.append(PaperRecord(
             title=title,
             authors=authors,
             year=year,
             source="Thèses.fr",
-            link=link,
+            link=_theses_fr_link(thesis),
             abstract=abstract,
-            keywords=keywords,
+            keywords=f"{keywords}; {', '.join(subjects)}" if subjects else keywords,
             citations=0
-        )
-    return len(theses_list)
-def fetch_articles_hal(query_phrases, domain=None, max_records=50):
+        ))
+    return records
+
+def fetch_theses_fr(query, max_results=None, sink=None, since=None, concurrency=THESES_FR_CONCURRENCY,
+                    details=True):
+    """
+    Stores every Thèses.fr thesis matching the query phrases (at most `max_results`),
+    requesting `concurrency` search pages at a time; see iter_theses_fr_pages.
+    `since` (YYYY-MM-DD) keeps only theses defended from that date on. That is the
+    defence date, not when the thesis was indexed, so FetchEngine doesn't use it
+    for incremental runs.
+
+    Returns:
+      Number of stored records.
+    """
+    # For Thèses.fr, if query is not a list, convert it to a list.
+    if not isinstance(query, list):
+        query_phrases = [query]
+    else:
+        query_phrases = query
+    q_param = build_theses_fr_query_phrases(query_phrases)
+    if since:
+        # Only theses defended on or after `since` (YYYY-MM-DD)
+        q_param = f"{q_param} AND dateSoutenance:[{since} TO *]"
+    keywords = ensure_query_string(query) if not isinstance(query, list) else " OR ".join(query)
+    with open_sink(sink) as sink:
+        pages = iter_theses_fr_pages(q_param, max_results, concurrency=concurrency, details=details,
+                                     db_path=sink.db_path)
+        return run_paper_pipeline("theses_fr", pages,
+                                  functools.partial(normalize_theses_fr_page, keywords=keywords), sink)
+
+HAL_SEARCH_URL = "https://api.archives-ouvertes.fr/search/"
+# Only the fields we store are requested (fl=)
+HAL_FIELDS = ["docid", "title_s", "authFullName_s", "producedDateY_i", "uri_s", "abstract_s", "doiId_s"]
+# Documents per search page; the API allows 10,000 but big pages are slow to start
+HAL_PAGE_SIZE = 500
+
+def hal_filters(since=None, year_from=None, year_to=None, domains=None):
+    """
+    Solr filter queries (fq=) for the HAL search API.
+
+    - since: YYYY-MM-DD; only documents added or modified since then.
+    - year_from / year_to: inclusive bounds on the production year.
+    - domains: HAL domain codes, e.g. ["sdv"] (Life Sciences) or ["sdv.bv"]
+      (Vegetal Biology); documents in any of them match.
+    """
+    filters = []
+    if since:
+        filters.append(f"modifiedDate_tdate:[{since}T00:00:00Z TO *]")
+    if year_from is not None or year_to is not None:
+        filters.append(f"producedDateY_i:[{year_from if year_from is not None else '*'} "
+                       f"TO {year_to if year_to is not None else '*'}]")
+    if domains:
+        if isinstance(domains, str):
+            domains = [domains]
+        # domain_s values carry their depth: "0.sdv", "1.sdv.bv"
+        filters.append("domain_s:(" + " OR ".join(f'"{d.count(".")}.{d}"' for d in domains) + ")")
+    return filters
+
+def iter_hal_search_pages(q, filters=(), max_results=None, rows=HAL_PAGE_SIZE):
     """
-    Searches HAL using the OAI-PMH interface at https://api.archives-ouvertes.fr/oai/hal/.
+    Yields the raw document lists of a HAL search, paging with cursorMark so
+    deep result sets cost the same per page as the first one.
+    """
+    params = {"q": q, "fq": list(filters), "fl": ",".join(HAL_FIELDS), "rows": rows,
+              "sort": "docid asc", "cursorMark": "*", "wt": "json"}
+    fetched, total = 0, 0
+    while True:
+        if max_results is not None:
+            params["rows"] = min(rows, max_results - fetched)
+        response = http_get(HAL_SEARCH_URL, source="hal", params=params)
+        if response.status_code != 200:
+            raise requests.HTTPError(f"HAL search failed with status code {response.status_code}",
+                                     response=response)
+        with METRICS.timer("parse_seconds", source="hal"):
+            data = response.json()
+        docs = data.get("response", {}).get("docs", [])
+        if params["cursorMark"] == "*":
+            total = data.get("response", {}).get("numFound", 0)
+            print(f"HAL found {total} results.")
+        if docs:
+            yield docs
+        fetched += len(docs)
+        next_cursor = data.get("nextCursorMark")
+        if (not docs or not next_cursor or next_cursor == params["cursorMark"] or fetched >= total
+                or (max_results is not None and fetched >= max_results)):
+            break
+        params["cursorMark"] = next_cursor
+
+def normalize_hal_search_page(docs, keywords):
+    """Maps one page of HAL search documents to PaperRecords."""
+    return [PaperRecord(
+        title=(doc.get("title_s") or ["Unknown Title"])[0],
+        authors=", ".join(doc.get("authFullName_s") or []) or "Unknown Author",
+        year=doc.get("producedDateY_i"),
+        source="HAL",
+        link=doc.get("uri_s", ""),
+        abstract=(doc.get("abstract_s") or [""])[0],
+        keywords=keywords,
+        citations=0,
+        doi=doc.get("doiId_s")
+    ) for doc in docs]
+
+def fetch_hal(query_phrases, sink=None, max_results=None, since=None, year_from=None, year_to=None,
+              domains=None, rows=HAL_PAGE_SIZE):
+    """
+    Searches HAL for documents whose title or abstract contains one of the phrases,
+    through the Solr search API (see build_hal_query_from_phrases).
+
+    Filtering happens on HAL's side, so only matching documents are downloaded,
+    with just the HAL_FIELDS columns. `since`, `year_from` / `year_to` and
+    `domains` narrow the search (see hal_filters).
+
+    Returns:
+      Number of stored records.
+    """
+    phrases = query_phrases if isinstance(query_phrases, list) else [query_phrases]
+    keywords = " OR ".join(phrases)
+    pages = iter_hal_search_pages(build_hal_query_from_phrases(phrases),
+                                  hal_filters(since, year_from, year_to, domains), max_results, rows)
+    with open_sink(sink) as sink:
+        return run_paper_pipeline("hal", pages, functools.partial(normalize_hal_search_page, keywords=keywords), sink)
+
+HAL_OAI_URL = "https://api.archives-ouvertes.fr/oai/hal/"
+OAI_NS = "{http://www.openarchives.org/OAI/2.0/}"
+DC_NS = "{http://purl.org/dc/elements/1.1/}"
+
+def _parse_hal_oai_record(rec):
+    """Maps one OAI-PMH <record> element to a paper dict, or None for deleted/empty records."""
+    metadata = rec.find(f"{OAI_NS}metadata")
+    if metadata is None:
+        return None
+    dc = metadata.find(".//{http://www.openarchives.org/OAI/2.0/oai_dc/}dc")
+    if dc is None:
+        return None
+
+    # Extract some DC metadata
+    title = dc.findtext(f"{DC_NS}title") or "Unknown Title"
+    authors_list = [creator.text for creator in dc.iterfind(f"{DC_NS}creator") if creator.text]
+    # HAL creators read "Last, First", so names are separated with "; " (see split_authors)
+    authors = "; ".join(authors_list) if authors_list else "Unknown Author"
+    year = dc.findtext(f"{DC_NS}date") or "Unknown Date"
+
+    # Typically we look for an identifier that starts with "https://"
+    link = ""
+    for id_el in dc.iterfind(f"{DC_NS}identifier"):
+        if id_el.text and id_el.text.startswith("https://"):
+            link = id_el.text
+            break
+
+    abstract = dc.findtext(f"{DC_NS}description") or ""
+    return {"title": title, "authors": authors, "year": year, "link": link, "abstract": abstract}
+
+def iter_hal_oai_records(domain=None, batch_size=100, max_records=None, headers=None, since=None):
+    """
+    Streams a HAL OAI-PMH set, following resumptionTokens until the set is exhausted.
+
+    Each page is parsed incrementally with iterparse and every <record> is cleared
+    once read, so memory stays flat regardless of the set size. `since`
+    (YYYY-MM-DD) asks only for records created or changed from that day on.
+
+    Yields:
+      Lists of up to `batch_size` paper dicts (see _parse_hal_oai_record).
+    """
+    params = {"verb": "ListRecords", "metadataPrefix": "oai_dc"}
+    if domain is not None:
+        # OAI-PMH 'set=' parameter to filter by domain
+        params["set"] = domain
+    if since:
+        params["from"] = since
+
+    batch, seen = [], 0
+    while params is not None:
+        token, container = None, None
+        with http_get(HAL_OAI_URL, source="hal", params=params, headers=headers, stream=True) as response:
+            response.raise_for_status()
+            response.raw.decode_content = True
+            for event, elem in ET.iterparse(response.raw, events=("start", "end")):
+                if event == "start":
+                    if elem.tag == f"{OAI_NS}ListRecords":
+                        container = elem
+                    continue
+                if elem.tag == f"{OAI_NS}record":
+                    with METRICS.timer("parse_seconds", source="hal"):
+                        record = _parse_hal_oai_record(elem)
+                    # Drop the finished record (and its siblings) from the tree
+                    if container is not None:
+                        container.clear()
+                    if record is None:
+                        continue
+                    batch.append(record)
+                    seen += 1
+                    if len(batch) >= batch_size:
+                        yield batch
+                        batch = []
+                    if max_records is not None and seen >= max_records:
+                        break
+                elif elem.tag == f"{OAI_NS}resumptionToken":
+                    token = (elem.text or "").strip() or None
+                elif elem.tag == f"{OAI_NS}error":
+                    code = elem.get("code")
+                    if code != "noRecordsMatch":
+                        # badResumptionToken, badArgument...: records were skipped, so the
+                        # harvest must not look complete (and move the watermark)
+                        raise ValueError(f"OAI error {code}: {(elem.text or '').strip()}")
+                    # An empty set or date range
+                    print(f"[HAL OAI] {code}: {elem.text}")
+
+        if max_records is not None and seen >= max_records:
+            break
+        params = {"verb": "ListRecords", "resumptionToken": token} if token else None
+
+    if batch:
+        yield batch
+
+def normalize_hal_batch(batch, source, keywords, quiet=False):
+    """
+    Maps a batch of parsed OAI records to PaperRecords. The XML itself is parsed
+    while streaming in iter_hal_oai_records, since the resumptionToken of the next
+    page is only known once a page has been read.
+    """
+    records = []
+    for record in batch:
+        if not quiet:
+            # Print debug info
+            print("---- HAL OAI Entry ----")
+            print(f"Title: {record['title']}")
+            print(f"Authors: {record['authors']}")
+            print(f"Date: {record['year']}")
+            print(f"Link: {record['link']}")
+            print("-----------------------")
+        records.append(PaperRecord(record["title"], record["authors"], record["year"], source, record["link"],
+                                   record["abstract"], keywords, 0))
+    return records
+
+def fetch_articles_hal(query_phrases, domain=None, max_records=50, sink=None, quiet=False, since=None):
+    """
+    Harvests HAL using the OAI-PMH interface at https://api.archives-ouvertes.fr/oai/hal/.
     
     - query_phrases: list of phrases (ignored by HAL OAI, since OAI-PMH doesn't allow ad-hoc keyword search).
-      We'll harvest records, then optionally filter them locally if needed.
+      We'll harvest records, then optionally filter them locally if needed; fetch_hal
+      searches for the phrases on HAL's side instead.
     - domain: optional set/domain name for OAI-PMH, e.g. 'hal:bio' for Life Sciences (Biology).
       You can see available sets at https://api.archives-ouvertes.fr/oai/hal/?verb=ListSets
-    - max_records: maximum number of records to process.
+    - max_records: maximum number of records to process; None harvests the whole set.
+    - sink: optional PaperSink to write through; a private one is opened otherwise.
+    - quiet: skip the per-record debug prints.
+    - since: YYYY-MM-DD; only records created or modified since then (OAI-PMH from=).
     
     Returns:
       Number of processed records.
     """
-    import xml.etree.ElementTree as ET
-    from fake_useragent import UserAgent
-    
     # Ensure we have a list of phrases
     if not isinstance(query_phrases, list):
         phrases = [query_phrases]
     else:
         phrases = query_phrases
-    
-    base_url = "https://api.archives-ouvertes.fr/oai/hal/"
-    # Standard OAI-PMH parameters
-    params = {
-        "verb": "ListRecords",
-        "metadataPrefix": "oai_dc"
-    }
-    if domain is not None:
-        # OAI-PMH 'set=' parameter to filter by domain
-        params["set"] = domain
-    
-    headers = {"User-Agent": UserAgent().random}
-    print(f"[HAL OAI] Debug: Requesting OAI with params={params}")
-    response = requests.get(base_url, params=params, headers=headers, timeout=30)
-    response.raise_for_status()
-    
-    # Parse the XML response
-    root = ET.fromstring(response.content)
-    ns = {
-        "oai": "http://www.openarchives.org/OAI/2.0/",
-        "dc": "http://purl.org/dc/elements/1.1/",
-        "oai_dc": "http://www.openarchives.org/OAI/2.0/oai_dc/"
-    }
-    records = root.findall(".//oai:record", ns)
-    print(f"[HAL OAI] Found {len(records)} records in set={domain or 'ALL'}.")
+    keywords = " OR ".join(phrases)
+    source = f"HAL OAI (Set={domain or 'All'})"
+    headers = {"User-Agent": random_user_agent()}
 
-    processed = 0
-    for rec in records:
-        if processed >= max_records:
-            break
-        metadata = rec.find("oai:metadata", ns)
-        if metadata is None:
-            continue
-        
-        dc = metadata.find(".//{http://www.openarchives.org/OAI/2.0/oai_dc/}dc")
-        if dc is None:
-            dc = metadata.find("dc:dc", ns)
-        if dc is None:
-            continue
-        
-        # Extract some DC metadata
-        title_el = dc.find("dc:title", ns)
-        title = title_el.text if title_el is not None else "Unknown Title"
-        
-        creators = dc.findall("dc:creator", ns)
-        authors_list = [creator.text for creator in creators if creator.text]
-        authors = ", ".join(authors_list) if authors_list else "Unknown Author"
-        
-        date_el = dc.find("dc:date", ns)
-        year = date_el.text if date_el is not None else "Unknown Date"
-        
-        # Typically we look for an identifier that starts with "https://"
-        identifiers = dc.findall("dc:identifier", ns)
-        link = ""
-        for id_el in identifiers:
-            if id_el.text and id_el.text.startswith("https://"):
-                link = id_el.text
-                break
-        
-        abstract_el = dc.find("dc:description", ns)
-        abstract = abstract_el.text if abstract_el is not None else ""
-        
-        # Print debug info
-        print("---- HAL OAI Entry ----")
-        print(f"Title: {title}")
-        print(f"Authors: {authors}")
-        print(f"Date: {year}")
-        print(f"Link: {link}")
-        print("-----------------------")
-        
-        # Insert record into DB
-        insert_paper(
-            title=title,
-            authors=authors,
-            year=year,
-            source=f"HAL OAI (Set={domain or 'All'})",
-            link=link,
-            abstract=abstract,
-            keywords=" OR ".join(phrases),
-            citations=0
-        )
-        processed += 1
+    batches = iter_hal_oai_records(domain, max_records=max_records, headers=headers, since=since)
+    normalize = functools.partial(normalize_hal_batch, source=source, keywords=keywords, quiet=quiet)
+    with open_sink(sink) as sink:
+        processed = run_paper_pipeline("hal_oai", batches, normalize, sink)
 
+    print(f"[HAL OAI] Stored {processed} records from set={domain or 'ALL'}.")
     return processed
 
+
 # ---------------- Main Execution ----------------
 
+# Default phrase list used by this script and by FetchEngine.py
+SEARCH_PHRASES = ["Genomic offset", "Plant adaptation", "Climate change"]
+
 if __name__ == "__main__":
     # Use a list of phrases for your search.
-    search_phrases = ["Genomic offset", "Plant adaptation", "Climate change"]
+    search_phrases = SEARCH_PHRASES
     # For functions expecting a single query string, join the list.
     query_string = ensure_query_string(search_phrases)
     
-    # Uncomment whichever functions you want to run:
-    # measure_performance(fetch_google_scholar, query_string)
-    # measure_performance(fetch_crossref, query_string)
-    # measure_performance(fetch_pubmed, query_string)
-    # measure_performance(fetch_paperity, query_string)
-    
-    # For HAL and Thèses.fr, we call the functions that support a list of phrases.
-    measure_performance(fetch_articles_hal, search_phrases)
-    measure_performance(fetch_theses_fr, search_phrases)
-    
-    print("Removing duplicate entries from the database...")
-    #remove_duplicates_from_db()
-    
+    # Metrics snapshot is rewritten every 15 s while running and once at the end.
+    METRICS.start_exporter(METRICS_FILE, interval=15)
+
+    # All fetchers share one sink so rows are committed in batches, and
+    # near-duplicates across sources are clustered as they are stored.
+    with PaperSink(dedup=True) as sink:
+        # Uncomment whichever functions you want to run:
+        # measure_performance(fetch_google_scholar, query_string, sink=sink)
+        # measure_performance(fetch_crossref, query_string, sink=sink)
+        # measure_performance(fetch_pubmed, query_string, sink=sink)
+        # measure_performance(fetch_paperity, query_string, sink=sink)
+
+        # For HAL and Thèses.fr, we call the functions that support a list of phrases.
+        measure_performance(fetch_hal, search_phrases, sink=sink)
+        measure_performance(fetch_theses_fr, search_phrases, sink=sink)
+
+    METRICS.stop_exporter()
+    print(f"Metrics written to {METRICS_FILE}")
     print("Papers matching 'genomics':", search_papers("genomics"))
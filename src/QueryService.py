@@ -0,0 +1,390 @@
+"""
+Read-only HTTP/JSON query service over research.db.
+
+    python src/QueryService.py --db research.db --port 8765
+
+    GET /papers?q=genom*&source=HAL&year_from=2015&year_to=2024&author=smith&limit=100
+    GET /papers?cursor=<next_cursor of the previous page>&...same filters...
+    GET /projects?q=climate&limit=50
+
+Every response is {"items": [...], "count": n, "next_cursor": "..." or null}.
+Papers come newest first (year, then id); projects by id, newest first. Pass
+next_cursor back with the same filters to get the following page: the cursor
+holds the last row's (year, id), so a page costs the same however deep it is,
+and papers stored between two pages neither repeat nor shift rows.
+
+`q` takes the same syntax as search_papers (words, "phrases", prefix*) but
+only filters; relevance ranking stays with search_papers. Large pages are
+streamed with chunked transfer encoding as rows are read, so the service never
+holds a whole result set. Small pages are kept in an LRU cache that is
+emptied as soon as any writer commits to the database.
+"""
+import sys
+import os
+import json
+import time
+import base64
+import itertools
+import queue
+import sqlite3
+import argparse
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from pathlib import Path
+from urllib.parse import urlsplit, parse_qs
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.Database_Calls import DB_PATH, PAPER_COLUMNS, _paper_filters, to_fts_query
+from utils.Metrics import METRICS
+
+# Read-only connections shared by the request threads
+POOL_SIZE = 4
+# Compiled statements kept per connection; each filter combination is one statement
+STATEMENT_CACHE = 64
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 100000
+# Rows read from SQLite and written to the socket at a time
+STREAM_ROWS = 500
+# Responses kept in the LRU cache, and the largest page (in rows) that is cached
+CACHE_SIZE = 256
+CACHE_MAX_ROWS = 1000
+
+TABLES = {
+    "papers": {
+        "columns": ("id",) + PAPER_COLUMNS + ("doi",),
+        "filters": ("q", "source", "year_from", "year_to", "author"),
+    },
+    "projects": {
+        "columns": ("id", "title", "institution", "country", "start_year", "end_year", "researchers",
+                    "link", "abstract", "keywords"),
+        "filters": ("q",),
+    },
+}
+
+class ReadPool:
+    """
+    A fixed set of read-only connections (mode=ro URIs with query_only on), so
+    the service can never write to the database whatever SQL it runs.
+
+    sqlite3 keeps the last STATEMENT_CACHE compiled statements of each
+    connection, so the parameterized queries built below are prepared once per
+    connection and reused by every request with the same filters.
+    """
+
+    def __init__(self, db_path=DB_PATH, size=POOL_SIZE):
+        if not os.path.exists(db_path):
+            raise FileNotFoundError(db_path)
+        self.uri = Path(db_path).resolve().as_uri() + "?mode=ro"
+        self._idle = queue.Queue()
+        for _ in range(size):
+            self._idle.put(self.open())
+
+    def open(self):
+        conn = sqlite3.connect(self.uri, uri=True, check_same_thread=False,
+                               cached_statements=STATEMENT_CACHE)
+        conn.execute("PRAGMA query_only=1")
+        return conn
+
+    @contextmanager
+    def connection(self):
+        """Borrows an idle connection for the block, waiting while all are in use."""
+        conn = self._idle.get()
+        try:
+            yield conn
+        finally:
+            self._idle.put(conn)
+
+    def close(self):
+        while not self._idle.empty():
+            self._idle.get().close()
+
+class QueryCache:
+    """
+    LRU cache of response bodies, emptied whenever the database changes.
+
+    Change detection uses PRAGMA data_version on a connection of its own, whose
+    value moves whenever another connection (a PaperSink, the enricher, another
+    process) commits. Checking it is a read of the WAL index, cheap enough to do
+    on every request.
+    """
+
+    def __init__(self, pool, size=CACHE_SIZE):
+        self.size = size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._watch = pool.open()
+        self.version = self._data_version()
+
+    def _data_version(self):
+        return self._watch.execute("PRAGMA data_version").fetchone()[0]
+
+    def check(self):
+        """Empties the cache if a writer committed since the last check; returns the current version."""
+        with self._lock:
+            version = self._data_version()
+            if version != self.version:
+                self._entries.clear()
+                self.version = version
+                METRICS.inc("query_cache_invalidations_total")
+            return version
+
+    def get(self, key):
+        with self._lock:
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+            return body
+
+    def put(self, key, body, version):
+        """Stores `body` unless the database changed after `version` was read."""
+        with self._lock:
+            if version != self.version:
+                return
+            self._entries[key] = body
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def close(self):
+        self._watch.close()
+
+def encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor, size):
+    """The `size` values encoded by encode_cursor; ValueError if `cursor` isn't one."""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except ValueError:
+        values = None
+    if not isinstance(values, list) or len(values) != size or not isinstance(values[-1], int):
+        raise ValueError("Invalid cursor")
+    return values
+
+def _int_param(params, name, default=None):
+    value = params.get(name)
+    if value in (None, ""):
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f"{name} must be an integer") from None
+
+def build_query(table, params):
+    """
+    The statements of one page of `table` as [(sql, args)], run one after the
+    other until `limit` rows are read, and `limit`. Each fetches one row more
+    than `limit` to know whether there is a next page. Raises ValueError on a
+    bad parameter.
+    """
+    spec = TABLES[table]
+    unknown = set(params) - set(spec["filters"]) - {"limit", "cursor"}
+    if unknown:
+        raise ValueError(f"Unknown parameter(s) for {table}: {', '.join(sorted(unknown))}")
+    limit = _int_param(params, "limit", DEFAULT_LIMIT)
+    if not 1 <= limit <= MAX_LIMIT:
+        raise ValueError(f"limit must be between 1 and {MAX_LIMIT}")
+    if table == "papers":
+        conditions, args = _paper_filters(params.get("source"), _int_param(params, "year_from"),
+                                          _int_param(params, "year_to"), params.get("author"))
+    else:
+        conditions, args = [], []
+    match = to_fts_query(params.get("q") or "")
+    if match:
+        conditions.append(f"t.id IN (SELECT rowid FROM {table}_fts WHERE {table}_fts MATCH ?)")
+        args.append(match)
+    cursor = decode_cursor(params["cursor"], 2 if table == "papers" else 1) if params.get("cursor") else None
+    columns = ", ".join(f"t.{c}" for c in spec["columns"])
+
+    def statement(keyset=None, keyset_args=(), order="t.id DESC"):
+        where = conditions + [keyset] if keyset else conditions
+        where = " WHERE " + " AND ".join(where) if where else ""
+        return (f"SELECT {columns} FROM {table} t{where} ORDER BY {order} LIMIT ?",
+                (*args, *keyset_args, limit + 1))
+
+    if table != "papers":
+        return [statement("t.id < ?", cursor) if cursor else statement()], limit
+    if cursor is None:
+        return [statement(order="t.year DESC, t.id DESC")], limit
+    year, last_id = cursor
+    if year is None:
+        return [statement("t.year IS NULL AND t.id < ?", (last_id,))], limit
+    # NULL years sort last. Reading them with a second statement, instead of an
+    # OR in the first, keeps both a range seek on the year index
+    return [statement("(t.year, t.id) < (?, ?)", (year, last_id), "t.year DESC, t.id DESC"),
+            statement("t.year IS NULL")], limit
+
+def _cursor_of(table, item):
+    return encode_cursor([item["year"], item["id"]] if table == "papers" else [item["id"]])
+
+class UnknownTable(LookupError):
+    """Raised by QueryService.query for a table it doesn't serve."""
+
+class QueryService:
+    """
+    Runs page queries on a ReadPool and renders them as JSON.
+
+    query() returns the whole body as bytes when it came from the cache, or a
+    generator of body chunks that keeps its connection until it is exhausted.
+    """
+
+    def __init__(self, db_path=DB_PATH, pool_size=POOL_SIZE, cache_size=CACHE_SIZE):
+        self.pool = ReadPool(db_path, pool_size)
+        self.cache = QueryCache(self.pool, cache_size)
+
+    def query(self, table, params):
+        if table not in TABLES:
+            raise UnknownTable(table)
+        statements, limit = build_query(table, params)
+        key = (table, tuple(sorted(params.items())))
+        version = self.cache.check()
+        body = self.cache.get(key)
+        METRICS.inc("query_requests_total", table=table, cache="hit" if body is not None else "miss")
+        if body is not None:
+            return body
+        return self._stream(table, statements, limit, key if limit <= CACHE_MAX_ROWS else None, version)
+
+    @staticmethod
+    def _rows(conn, statements):
+        """Rows of each statement in turn, read STREAM_ROWS at a time."""
+        for sql, args in statements:
+            cursor = conn.execute(sql, args)
+            try:
+                while True:
+                    rows = cursor.fetchmany(STREAM_ROWS)
+                    if not rows:
+                        break
+                    yield from rows
+            finally:
+                cursor.close()
+
+    def _stream(self, table, statements, limit, cache_key, version):
+        columns = TABLES[table]["columns"]
+        parts = [] if cache_key is not None else None
+        with self.pool.connection() as conn:
+            rows_iter = self._rows(conn, statements)
+            try:
+                count, last = 0, None
+                chunk = [b'{"items": [']
+                while count < limit:
+                    rows = list(itertools.islice(rows_iter, min(STREAM_ROWS, limit - count)))
+                    if not rows:
+                        break
+                    items = [dict(zip(columns, row)) for row in rows]
+                    text = ", ".join(json.dumps(item, ensure_ascii=False) for item in items)
+                    chunk.append(((", " if count else "") + text).encode("utf-8"))
+                    count += len(rows)
+                    last = items[-1]
+                    data = b"".join(chunk)
+                    if parts is not None:
+                        parts.append(data)
+                    yield data
+                    chunk = []
+                more = count == limit and next(rows_iter, None) is not None
+            finally:
+                rows_iter.close()
+        next_cursor = _cursor_of(table, last) if more else None
+        data = b"".join(chunk) + f'], "count": {count}, "next_cursor": {json.dumps(next_cursor)}}}'.encode()
+        yield data
+        METRICS.inc("query_rows_total", count, table=table)
+        if parts is not None:
+            self.cache.put(cache_key, b"".join(parts) + data, version)
+
+    def close(self):
+        self.cache.close()
+        self.pool.close()
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _send_json(self, status, body):
+        body = body if isinstance(body, bytes) else json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_chunked(self, chunks):
+        try:
+            # The query runs up to the first chunk, so its errors still get a proper status
+            first = next(chunks)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            try:
+                for data in itertools.chain([first], chunks):
+                    if data:
+                        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                self.wfile.write(b"0\r\n\r\n")
+            except Exception as e:
+                # The 200 is already sent: close without the final chunk so the client sees a cut body
+                self.close_connection = True
+                if not isinstance(e, ConnectionError):
+                    print(f"❌ {self.path} failed mid-stream: {e!r}")
+        finally:
+            # Hands the connection back to the pool even if the client went away
+            chunks.close()
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        table = parts.path.strip("/")
+        params = {k: v[-1] for k, v in parse_qs(parts.query).items()}
+        start = time.perf_counter()
+        try:
+            result = self.server.service.query(table, params)
+            if isinstance(result, bytes):
+                self._send_json(200, result)
+            else:
+                self._send_chunked(result)
+        except UnknownTable:
+            self._send_json(404, {"error": f"Unknown endpoint: /{table}", "endpoints": sorted(TABLES)})
+        except (ValueError, sqlite3.OperationalError) as e:
+            # Malformed cursors and numbers, and full-text syntax SQLite rejects
+            self._send_json(400, {"error": str(e)})
+        except ConnectionError:
+            raise
+        except Exception as e:
+            print(f"❌ {self.path} failed: {e!r}")
+            self._send_json(500, {"error": "Internal server error"})
+        METRICS.observe("query_seconds", time.perf_counter() - start, table=table)
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients closing the connection mid-stream are expected, not worth a traceback
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+def serve(db_path=DB_PATH, host="127.0.0.1", port=8765, pool_size=POOL_SIZE, cache_size=CACHE_SIZE):
+    """Serves `db_path` until interrupted."""
+    service = QueryService(db_path, pool_size, cache_size)
+    server = _Server((host, port), _Handler)
+    server.service = service
+    print(f"🔎 Serving {db_path} read-only on http://{host}:{server.server_port}/papers")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve read-only JSON queries over the research database.")
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--pool-size", type=int, default=POOL_SIZE, help="read-only connections")
+    parser.add_argument("--cache-size", type=int, default=CACHE_SIZE, help="responses kept in the LRU cache")
+    args = parser.parse_args()
+
+    serve(args.db, args.host, args.port, args.pool_size, args.cache_size)
@@ -0,0 +1,296 @@
+"""
+Background enrichment of Google Scholar search results.
+
+fetch_google_scholar stores each hit straight from the search page and queues
+it here. The enricher then calls scholarly.fill() for queued hits (full author
+list, year, venue), paced by the shared rate limiter and rotating proxies from
+PROXY_POOL when one gets blocked.
+
+scholarly drives a single process-wide navigator, so every call into it (fill,
+use_proxy, and the search pages of fetch_google_scholar) holds SCHOLARLY_LOCK:
+a proxy is never switched while another thread is in the middle of a request.
+
+The queue lives in the scholar_enrichment table of the research database, so a
+stopped run resumes where it left off, and a hit that was filled once is never
+filled again.
+
+    python src/ScholarEnricher.py --limit 500
+"""
+import sys
+import os
+import json
+import time
+import sqlite3
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from scholarly import scholarly, ProxyGenerator
+from scholarly.data_types import PublicationSource
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.Database_Calls import DB_PATH, coerce_year, link_authors
+from utils.Proxies import PROXY_POOL
+from utils.Rate_Limit import RATE_LIMITER
+from utils.Metrics import METRICS
+
+SCHOLAR_HOST = "scholar.google.com"
+# Serializes every use of the global scholarly navigator, here and in Main
+SCHOLARLY_LOCK = threading.RLock()
+_scholarly_proxy = None
+# Tries per queued hit before it is marked failed
+MAX_ATTEMPTS = 3
+# Seconds between queue checks while running in the background
+POLL_INTERVAL = 10
+
+def ensure_enrichment_queue(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS scholar_enrichment (
+            identity_key TEXT PRIMARY KEY,
+            result TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            venue TEXT,
+            error TEXT,
+            updated_at TEXT
+        )
+    ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_scholar_enrichment_status ON scholar_enrichment(status)")
+
+def use_scholarly_proxy(pg):
+    """Points scholarly at ProxyGenerator `pg` unless it already is; hold SCHOLARLY_LOCK."""
+    global _scholarly_proxy
+    if pg is not _scholarly_proxy:
+        scholarly.use_proxy(pg)
+        _scholarly_proxy = pg
+
+def _dump_result(result):
+    data = dict(result)
+    # PublicationSource is an Enum; store its value so the row stays plain JSON
+    data["source"] = getattr(data.get("source"), "value", data.get("source"))
+    return json.dumps(data, default=str)
+
+def _load_result(text):
+    data = json.loads(text)
+    if data.get("source"):
+        data["source"] = PublicationSource(data["source"])
+    return data
+
+def enqueue_enrichment(conn, items):
+    """
+    Queues (identity_key, scholarly search result) pairs for filling. Hits that
+    are already queued, filled or failed are left as they are.
+    """
+    conn.executemany(
+        "INSERT OR IGNORE INTO scholar_enrichment (identity_key, result, updated_at) VALUES (?, ?, datetime('now'))",
+        [(key, _dump_result(result)) for key, result in items],
+    )
+
+def _authors(bib):
+    authors = bib.get("author")
+    if not authors:
+        return None
+    # Filled records carry the BibTeX form "A and B and C"
+    names = authors if isinstance(authors, list) else [a.strip() for a in authors.split(" and ")]
+    # "Last, First" names need the separator split_authors reads as one name per part
+    return ("; " if any("," in name for name in names) else ", ").join(names)
+
+class ScholarEnricher:
+    """
+    Fills queued Google Scholar hits with `workers` threads. The scholarly calls
+    themselves run one at a time under SCHOLARLY_LOCK, so extra workers only
+    overlap rate-limit waits and database writes.
+
+    run() processes the queue until it is empty; start() does the same from a
+    background thread, checking for new hits every `poll_interval` seconds until
+    stop(). Hits left 'running' by an interrupted run go back to the queue.
+    """
+
+    def __init__(self, db_path=DB_PATH, workers=1, max_attempts=MAX_ATTEMPTS, proxy_pool=PROXY_POOL,
+                 use_proxies=True, poll_interval=POLL_INTERVAL):
+        self.db_path = db_path
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.proxy_pool = proxy_pool
+        self.use_proxies = use_proxies
+        self.poll_interval = poll_interval
+        self.filled = 0
+        self.failed = 0
+        self._proxy = None
+        self._pg = None
+        self._stop = threading.Event()
+        self._thread = None
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        with self.conn:
+            ensure_enrichment_queue(self.conn)
+            self.conn.execute("UPDATE scholar_enrichment SET status = 'pending' WHERE status = 'running'")
+
+    # ---------------- Queue ----------------
+
+    def pending(self):
+        return self.conn.execute(
+            "SELECT COUNT(*) FROM scholar_enrichment WHERE status = 'pending'").fetchone()[0]
+
+    def _claim(self, n):
+        with self.conn:
+            rows = self.conn.execute(
+                "SELECT identity_key, result, attempts FROM scholar_enrichment "
+                "WHERE status = 'pending' ORDER BY updated_at LIMIT ?", (n,)).fetchall()
+            self.conn.executemany(
+                "UPDATE scholar_enrichment SET status = 'running', attempts = attempts + 1 WHERE identity_key = ?",
+                [(key,) for key, _, _ in rows])
+        return [(key, result, attempts + 1) for key, result, attempts in rows]
+
+    def _store(self, key, paper):
+        bib = paper.get("bib", {})
+        abstract = bib.get("abstract") or ""
+        venue = bib.get("journal") or bib.get("booktitle") or bib.get("venue")
+        authors = _authors(bib)
+        with self.conn:
+            self.conn.execute('''
+                UPDATE papers SET
+                    authors = COALESCE(?, authors),
+                    year = COALESCE(?, year),
+                    link = COALESCE(NULLIF(link, ''), ?),
+                    abstract = CASE WHEN LENGTH(?) > LENGTH(COALESCE(abstract, '')) THEN ? ELSE abstract END,
+                    citations = MAX(COALESCE(citations, 0), ?)
+                WHERE identity_key = ?
+            ''', (authors, coerce_year(bib.get("pub_year")), paper.get("pub_url"), abstract, abstract,
+                  paper.get("num_citations") or 0, key))
+            if authors:
+                # The filled author list replaces the truncated one of the search page
+                link_authors(self.conn, [key], replace=True)
+            self.conn.execute(
+                "UPDATE scholar_enrichment SET status = 'filled', result = ?, venue = ?, error = NULL, "
+                "updated_at = datetime('now') WHERE identity_key = ?",
+                (_dump_result(paper), venue, key))
+        self.filled += 1
+        METRICS.inc("scholar_enrichment_total", status="filled")
+
+    def _fail(self, key, attempts, error):
+        status = "failed" if attempts >= self.max_attempts else "pending"
+        with self.conn:
+            self.conn.execute(
+                "UPDATE scholar_enrichment SET status = ?, error = ?, updated_at = datetime('now') "
+                "WHERE identity_key = ?", (status, error, key))
+        if status == "failed":
+            self.failed += 1
+        METRICS.inc("scholar_enrichment_total", status="failed" if status == "failed" else "retried")
+
+    def _release(self, error):
+        """Returns hits claimed by a failed run to the queue, or fails those out of attempts."""
+        with self.conn:
+            self.conn.execute(
+                "UPDATE scholar_enrichment SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+                "error = ?, updated_at = datetime('now') WHERE status = 'running'", (self.max_attempts, error))
+
+    # ---------------- Filling ----------------
+
+    def _rotate_proxy(self, bad=None):
+        """Moves scholarly to another proxy from the pool, counting a failure against `bad`."""
+        with SCHOLARLY_LOCK:
+            if bad is not None and bad is self._proxy:
+                self.proxy_pool.report_failure(bad)
+            elif bad is not None:
+                return  # Another worker already rotated away from it
+            proxy = self.proxy_pool.get_proxy()
+            if proxy:
+                pg = ProxyGenerator()
+                pg.SingleProxy(http=proxy["http"], https=proxy["https"])
+                use_scholarly_proxy(pg)
+                self._pg = pg
+            self._proxy = proxy
+
+    def _fill(self, result):
+        RATE_LIMITER.acquire(SCHOLAR_HOST, "google_scholar")
+        with SCHOLARLY_LOCK:
+            if self._pg is not None:
+                # fetch_google_scholar may have moved scholarly to its own proxy meanwhile
+                use_scholarly_proxy(self._pg)
+            proxy = self._proxy
+            start = time.monotonic()
+            try:
+                paper = scholarly.fill(result)
+            except Exception:
+                RATE_LIMITER.feedback(SCHOLAR_HOST, 429)
+                if self.use_proxies:
+                    self._rotate_proxy(bad=proxy)
+                raise
+        RATE_LIMITER.feedback(SCHOLAR_HOST, 200)
+        if proxy:
+            self.proxy_pool.report_success(proxy, time.monotonic() - start)
+        return paper
+
+    def run(self, limit=None):
+        """Fills queued hits until the queue is empty, `limit` hits were tried or stop() is called."""
+        if self.use_proxies and self._proxy is None:
+            self._rotate_proxy()
+            if self._proxy is None:
+                print("⚠️ No proxies available; enriching Google Scholar hits without one.")
+        tried = 0
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            while not self._stop.is_set() and (limit is None or tried < limit):
+                batch = self.workers * 2 if limit is None else min(self.workers * 2, limit - tried)
+                jobs = self._claim(batch)
+                if not jobs:
+                    break
+                futures = {pool.submit(self._fill, _load_result(result)): (key, attempts)
+                           for key, result, attempts in jobs}
+                # Results are written from this thread only, on the enricher's own connection
+                for future in as_completed(futures):
+                    key, attempts = futures[future]
+                    try:
+                        self._store(key, future.result())
+                    except Exception as e:
+                        self._fail(key, attempts, f"{type(e).__name__}: {e}")
+                tried += len(jobs)
+        return self.filled
+
+    def start(self):
+        """Runs the enricher in a daemon thread until stop()."""
+        def loop():
+            while not self._stop.is_set():
+                try:
+                    self.run()
+                except Exception as e:
+                    # A scholarly, proxy or database failure must not end the background thread
+                    print(f"❌ Google Scholar enrichment failed: {type(e).__name__}: {e}")
+                    try:
+                        self._release(f"{type(e).__name__}: {e}")
+                    except sqlite3.Error as e:
+                        print(f"❌ Could not requeue claimed Google Scholar hits: {e}")
+                self._stop.wait(self.poll_interval)
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=loop, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stops after the batch in progress; unfinished hits stay queued for the next run."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def close(self):
+        self.stop()
+        with self.conn:
+            self.conn.execute("UPDATE scholar_enrichment SET status = 'pending' WHERE status = 'running'")
+        self.conn.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fill queued Google Scholar hits.")
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--limit", type=int, help="stop after this many hits")
+    parser.add_argument("--no-proxies", action="store_true", help="don't route scholarly through PROXY_POOL")
+    args = parser.parse_args()
+
+    enricher = ScholarEnricher(args.db, workers=args.workers, use_proxies=not args.no_proxies)
+    print(f"{enricher.pending()} Google Scholar hits waiting to be filled")
+    try:
+        enricher.run(limit=args.limit)
+    finally:
+        enricher.close()
+    print(f"✅ Filled {enricher.filled} hits, {enricher.failed} failed for good")
@@ -1,112 +1,73 @@
-import requests
-import re
+import sys
+import os
 import time
-import random
-import json
-import pandas as pd
-from bs4 import BeautifulSoup
-from fake_useragent import UserAgent
+import csv
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
 from tqdm import tqdm
 from requests.exceptions import ProxyError, ConnectTimeout
 
-BAD_PROXIES_FILE = "bad_proxies.json"
-OUTPUT_FILE = "universities.csv"
-MAX_RETRIES = 5
-
-# Load bad proxies from file
-def load_bad_proxies():
-    try:
-        with open(BAD_PROXIES_FILE, "r") as f:
-            return set(json.load(f))
-    except (FileNotFoundError, json.JSONDecodeError):
-        return set()
-
-# Save bad proxies to file
-def save_bad_proxy(proxy):
-    bad_proxies = load_bad_proxies()
-    bad_proxies.add(proxy)
-    with open(BAD_PROXIES_FILE, "w") as f:
-        json.dump(list(bad_proxies), f, indent=4)
-
-# Get proxies from free sources
-def get_proxies():
-    regex = r"[0-9]+(?:\.[0-9]+){3}:[0-9]+"
-    try:
-        c = requests.get("https://spys.me/proxy.txt", timeout=10)
-        proxies = re.findall(regex, c.text)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-        d = requests.get("https://free-proxy-list.net/", timeout=10)
-        soup = BeautifulSoup(d.content, 'html.parser')
+from utils.Proxies import PROXY_POOL
+from utils.Http_Client import get as http_get, random_user_agent
+from utils.Metrics import METRICS
+from utils.Html_Parsers import parse, parse_universityguru, current_backend
 
-        for row in soup.select("#proxylisttable tbody tr"):
-            cols = row.find_all("td")
-            if cols[4].text.strip().lower() == "elite proxy":
-                proxies.append(f"{cols[0].text.strip()}:{cols[1].text.strip()}")
-
-        # Remove bad proxies
-        bad_proxies = load_bad_proxies()
-        proxies = [p for p in proxies if p not in bad_proxies]
-
-        return proxies
-    except Exception as e:
-        print(f"Error fetching proxies: {e}")
-        return []
-
-PROXIES = get_proxies()
-print(f"Using {len(PROXIES)} proxies after filtering bad ones")
-
-ua = UserAgent()
-
-# Get a random proxy
-def get_proxy():
-    if not PROXIES:
-        return None
-    proxy = random.choice(PROXIES)
-    return {"http": f"http://{proxy}", "https": f"https://{proxy}"}
+GEONAMES_URL = "http://api.geonames.org/countryInfoJSON?username=miratesting"
+UNIVERSITYGURU_URL = "https://www.universityguru.com"
+OUTPUT_FILE = "universities.csv"
+# One finished country code per line; countries listed here are skipped on restart
+CHECKPOINT_FILE = "universities_checkpoint.txt"
+MAX_RETRIES = 5
+MAX_WORKERS = 8
 
 # Get all country codes
 def get_country_data():
     try:
-        url = "http://api.geonames.org/countryInfoJSON?username=miratesting"
-        response = requests.get(url, timeout=10).json()
+        url = GEONAMES_URL
+        # Served from the local response cache after the first run (see SOURCE_TTLS)
+        response = http_get(url, source="geonames").json()
         return {country['countryCode']: country['countryName'] for country in response.get('geonames', [])}
     except Exception as e:
         print(f"Error fetching country data: {e}")
         return {}
 
-# Scrape university names for a country
-def get_universities(country_code, country_name):
-    url = f"https://www.universityguru.com/{country_code}"
-    universities = []
-    headers = {"User-Agent": ua.random}
+# Download a country's universityguru page; None if every attempt failed
+def fetch_universities_page(country_code, country_name):
+    url = f"{UNIVERSITYGURU_URL}/{country_code}"
+    headers = {"User-Agent": random_user_agent()}
 
     for retries in range(MAX_RETRIES):
-        proxy = get_proxy()
+        proxy = PROXY_POOL.get_proxy()
         try:
-            print(f"Attempting to scrape {country_name} using proxy {proxy['http']}")
-            time.sleep(random.uniform(3, 7))  # Random delay to avoid detection
-            
-            response = requests.get(url, headers=headers, proxies=proxy, timeout=10)
+            print(f"Attempting to scrape {country_name} using proxy {proxy['http'] if proxy else 'none'}")
+
+            # Pacing comes from the shared per-host rate limiter inside http_get
+            start = time.monotonic()
+            response = http_get(url, source="universityguru", headers=headers, proxies=proxy)
             if response.status_code == 403:
                 raise ProxyError("403 Forbidden: Blocked by bot detection")
-
-            soup = BeautifulSoup(response.text, 'html.parser')
-            uni_list = soup.select("div.university-name a")
-
-            for uni in uni_list:
-                universities.append(uni.text.strip())
-
-            print(f"✅ Scraped {len(universities)} universities from {country_name}")
-            return universities
+            if response.status_code == 429 or response.status_code >= 500:
+                # Throttled, or a failing proxy/server: worth another attempt
+                raise ProxyError(f"HTTP {response.status_code}")
+            if response.status_code != 200:
+                # Any other status would parse to 0 universities and be checkpointed as done
+                print(f"⚠️ Error scraping {country_name}: HTTP {response.status_code}")
+                break
+            if proxy:
+                PROXY_POOL.report_success(proxy, time.monotonic() - start)
+            return response.text
 
         except (ProxyError, ConnectTimeout) as e:
+            if proxy is None:
+                print(f"⚠️ Request failed without a proxy: {e}")
+                continue
             proxy_address = proxy["http"].split("//")[1]  # Extract proxy address
             print(f"⚠️ Proxy failed: {proxy_address}. Retrying with a new proxy...")
 
-            # Save bad proxy and remove it from the list
-            save_bad_proxy(proxy_address)
-            if proxy_address in PROXIES:
-                PROXIES.remove(proxy_address)
+            # Count the failure; the pool bans the proxy after repeated failures
+            PROXY_POOL.report_failure(proxy)
             
             continue  # Retry with a new proxy
 
@@ -114,21 +75,86 @@ def get_universities(country_code, country_name):
             print(f"⚠️ Error scraping {country_name}: {e}")
             break  # Stop retrying for non-proxy-related issues
 
+    return None
+
+# Scrape university names for a country; None if every attempt failed
+def get_universities(country_code, country_name):
+    page = fetch_universities_page(country_code, country_name)
+    if page is None:
+        return None
+    with METRICS.timer("parse_seconds", source="universityguru"):
+        universities = parse_universityguru(page)
+    print(f"✅ Scraped {len(universities)} universities from {country_name}")
     return universities
 
+def load_checkpoint(checkpoint_file=CHECKPOINT_FILE):
+    try:
+        with open(checkpoint_file, "r") as f:
+            return {line.strip() for line in f if line.strip()}
+    except FileNotFoundError:
+        return set()
+
 # Main function
-def scrape_all_universities():
+def scrape_all_universities(output_file=OUTPUT_FILE, checkpoint_file=CHECKPOINT_FILE, max_workers=MAX_WORKERS,
+                            parse_workers=None):
+    """
+    Scrapes every country with a pool of `max_workers` threads.
+
+    With `parse_workers`, pages are parsed in a pool of that many processes
+    instead of in the download threads, so parsing doesn't compete with
+    downloads for the GIL.
+
+    Each country's rows are appended to `output_file` as soon as it finishes and
+    its code is then recorded in `checkpoint_file`, so a restarted run resumes
+    where the previous one stopped. Countries that failed are not recorded and
+    are retried on the next run.
+
+    Returns:
+      Number of universities saved by this run.
+    """
     country_data = get_country_data()
-    all_universities = []
-
-    for country_code, country_name in tqdm(country_data.items(), desc="Scraping universities"):
-        universities = get_universities(country_code.lower(), country_name)
-        for uni in universities:
-            all_universities.append({"Country": country_name, "University": uni})
-
-    df = pd.DataFrame(all_universities)
-    df.to_csv(OUTPUT_FILE, index=False)
-    print(f"Saved {len(df)} universities to {OUTPUT_FILE}")
+    done = load_checkpoint(checkpoint_file)
+    todo = {code: name for code, name in country_data.items() if code not in done}
+    print(f"{len(done)} countries already scraped, {len(todo)} to go")
+
+    write_header = not os.path.exists(output_file) or os.path.getsize(output_file) == 0
+    saved = 0
+    with open(output_file, "a", newline="", encoding="utf-8") as out, \
+            open(checkpoint_file, "a") as checkpoint, \
+            ThreadPoolExecutor(max_workers=max_workers) as pool, \
+            (ProcessPoolExecutor(max_workers=parse_workers) if parse_workers else nullcontext()) as parsers, \
+            tqdm(total=len(todo), desc="Scraping universities") as progress:
+        writer = csv.writer(out)
+        if write_header:
+            writer.writerow(["Country", "University"])
+        fetch = fetch_universities_page if parsers else get_universities
+        futures = {pool.submit(fetch, code.lower(), name): (code, name) for code, name in todo.items()}
+        pending = set(futures)
+        # Results are written from this thread only, so the files need no locking
+        while pending:
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                code, name = futures.pop(future)
+                result = future.result()
+                if result is None:
+                    progress.update()
+                    continue
+                if isinstance(result, str):
+                    # A downloaded page: hand it to the parser processes
+                    parsed = parsers.submit(parse, "universityguru", result, current_backend())
+                    futures[parsed] = (code, name)
+                    pending.add(parsed)
+                    continue
+                writer.writerows([name, uni] for uni in result)
+                out.flush()
+                # Checkpoint only after the rows are on disk
+                checkpoint.write(code + "\n")
+                checkpoint.flush()
+                saved += len(result)
+                progress.update()
+
+    print(f"Saved {saved} universities to {output_file}")
+    return saved
 
 # Run the scraper
 if __name__ == "__main__":
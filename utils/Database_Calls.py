@@ -1,10 +1,48 @@
+import hashlib
+import re
 import sqlite3
-import pandas as pd
+import threading
+import time
+import unicodedata
+from collections import Counter
+from contextlib import contextmanager
 import tqdm
 import openpyxl
+from utils.Metrics import METRICS
 
-def create_database():
-    conn = sqlite3.connect("research.db")
+DB_PATH = "research.db"
+
+PAPER_COLUMNS = ("title", "authors", "year", "source", "link", "abstract", "keywords", "citations")
+# Columns derived from the paper on insert, after PAPER_COLUMNS in every stored row
+DERIVED_COLUMNS = ("doi", "title_norm", "identity_key")
+# Rows read from papers per chunk when a migration backfills a large table
+MIGRATION_CHUNK = 5000
+# Source prefix of HAL OAI rows, whose older rows joined "Last, First" creators with commas
+LAST_FIRST_SOURCE = "HAL OAI"
+
+# Merge rules applied when an incoming paper has the identity_key of a stored one:
+# keep the higher citation count and fill in or lengthen the abstract/link/year/doi.
+PAPER_UPSERT_SQL = f'''
+    INSERT INTO papers ({", ".join(PAPER_COLUMNS + DERIVED_COLUMNS)})
+    VALUES ({", ".join("?" * (len(PAPER_COLUMNS) + len(DERIVED_COLUMNS)))})
+    ON CONFLICT(identity_key) DO UPDATE SET
+        citations = MAX(COALESCE(papers.citations, 0), COALESCE(excluded.citations, 0)),
+        abstract = CASE
+            WHEN LENGTH(COALESCE(excluded.abstract, '')) > LENGTH(COALESCE(papers.abstract, ''))
+            THEN excluded.abstract ELSE papers.abstract END,
+        link = COALESCE(NULLIF(papers.link, ''), excluded.link),
+        year = COALESCE(papers.year, excluded.year),
+        doi = COALESCE(papers.doi, excluded.doi)
+'''
+
+# Full-text indexed columns per table, and their BM25 weights
+FTS_COLUMNS = {
+    "papers": {"title": 10.0, "authors": 5.0, "abstract": 1.0, "keywords": 2.0},
+    "projects": {"title": 10.0, "institution": 5.0, "abstract": 1.0, "keywords": 2.0},
+}
+
+def create_database(db_path=DB_PATH):
+    conn = sqlite3.connect(db_path)
     cursor = conn.cursor()
     
     # Table for scientific papers & reviews
@@ -18,7 +56,10 @@ def create_database():
             link TEXT,
             abstract TEXT,
             keywords TEXT,
-            citations INTEGER DEFAULT 0
+            citations INTEGER DEFAULT 0,
+            identity_key TEXT,
+            doi TEXT,
+            title_norm TEXT
         )
     ''')
     
@@ -41,20 +82,422 @@ def create_database():
     # Indexes for faster searches
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_papers_keywords ON papers(keywords)")
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_projects_keywords ON projects(keywords)")
+
+    # One row per paper, and a full-text search index kept in sync by triggers
+    ensure_identity_index(conn)
+    ensure_fts_index(conn)
+    ensure_paper_schema(conn)
+    ensure_crawl_state(conn)
     
     conn.commit()
     conn.close()
     print("Database and tables created successfully!")
 
-def insert_paper(title, authors, year, source, link, abstract, keywords, citations=0):
-    conn = sqlite3.connect("research.db")
-    cursor = conn.cursor()
-    cursor.execute('''
-        INSERT INTO papers (title, authors, year, source, link, abstract, keywords, citations)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-    ''', (title, authors, year, source, link, abstract, keywords, citations))
+def _normalize_text(text):
+    """Lower-cased ASCII words only: accents, punctuation and extra spaces removed."""
+    text = unicodedata.normalize("NFKD", str(text or "")).encode("ascii", "ignore").decode()
+    return " ".join(re.findall(r"[a-z0-9]+", text.lower()))
+
+def _doi_from_link(link):
+    match = re.search(r"doi\.org/(10\.\S+)", link or "", re.IGNORECASE)
+    return match.group(1) if match else None
+
+def paper_identity_key(title, authors, year, link=None, doi=None):
+    """
+    Stable identity of a paper, used to merge repeated inserts into one row.
+
+    The DOI (given directly or taken from a doi.org link) when one is known,
+    otherwise a hash of the normalized title, first author and year.
+    """
+    doi = doi or _doi_from_link(link)
+    if doi:
+        return "doi:" + doi.strip().lower()
+    first_author = _normalize_text(str(authors or "").split(",")[0])
+    if first_author in ("unknown", "unknown author"):
+        first_author = ""
+    year_match = re.search(r"\d{4}", str(year or ""))
+    basis = "|".join((_normalize_text(title), first_author, year_match.group(0) if year_match else ""))
+    return "sha1:" + hashlib.sha1(basis.encode()).hexdigest()
+
+def coerce_year(value):
+    """
+    Year of `value` as an int, or None: the first plausible 4-digit year in strings
+    like "2021-05-03", "2019 Jan" or "Unknown Date".
+    """
+    if isinstance(value, int):
+        return value if 1000 <= value <= 2100 else None
+    match = re.search(r"(?<!\d)(1\d{3}|20\d{2}|2100)(?!\d)", str(value or ""))
+    return int(match.group(1)) if match else None
+
+def normalize_title(title):
+    """Title reduced to lower-cased ASCII words, stored as papers.title_norm."""
+    return _normalize_text(title) or None
+
+def normalize_doi(doi=None, link=None):
+    """Lower-cased bare DOI (10.xxx/...), given directly or taken from a doi.org link."""
+    doi = doi or _doi_from_link(link)
+    if not doi:
+        return None
+    return re.sub(r"^(https?://(dx\.)?doi\.org/|doi:)", "", doi.strip(), flags=re.IGNORECASE).lower()
+
+def split_authors(authors, source=None):
+    """
+    Individual author names of an authors field.
+
+    Names are comma-separated, except when the field uses "; " (HAL's
+    "Last, First; Last, First"), in which case "Last, First" becomes "First Last".
+    Rows of LAST_FIRST_SOURCE stored before that separator joined the same
+    "Last, First" names with commas, so for that source only an even run of
+    comma-separated parts is read as pairs.
+    Placeholders like "Unknown Author" are dropped.
+
+    >>> split_authors("Smith, Jones")
+    ['Smith', 'Jones']
+    >>> split_authors("Smith J, Consortium")
+    ['Smith J', 'Consortium']
+    >>> split_authors("Smith, J, Doe, Jane", source="HAL OAI (Set=All)")
+    ['J Smith', 'Jane Doe']
+    """
+    text = str(authors or "")
+    parts = text.split(",")
+    if ";" in text:
+        pairs = [part.partition(",")[::2] for part in text.split(";")]
+    elif str(source or "").startswith(LAST_FIRST_SOURCE) and len(parts) % 2 == 0:
+        pairs = list(zip(parts[::2], parts[1::2]))
+    else:
+        pairs = [(part, "") for part in parts]
+    names = [f"{first.strip()} {last.strip()}" if first.strip() else last for last, first in pairs]
+    names = [re.sub(r"\bUnknown\b", "", name).strip() for name in names]
+    return [name for name in names if _normalize_text(name) not in ("", "author")]
+
+def ensure_identity_index(conn):
+    """
+    Adds papers.identity_key and its unique index if missing.
+
+    On a database created before identity keys this backfills the key for every
+    row, merges existing duplicates into their oldest row (same rules as
+    PAPER_UPSERT_SQL) and deletes the rest, so it runs once per database.
+    """
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(papers)")]
+    if "identity_key" not in columns:
+        conn.execute("ALTER TABLE papers ADD COLUMN identity_key TEXT")
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'idx_papers_identity'").fetchone():
+        return
+
+    # link, year and doi keep the oldest non-empty value, like the COALESCEs of PAPER_UPSERT_SQL
+    first_values = "".join(f''',
+            {column} = COALESCE((SELECT d.{column} FROM papers d
+                                 WHERE d.identity_key = papers.identity_key AND NULLIF(d.{column}, '') IS NOT NULL
+                                 ORDER BY d.id LIMIT 1), {column})''' for column in ("link", "year", "doi")
+                           if column in columns)
+    conn.create_function("paper_identity_key", 4, paper_identity_key)
+    conn.executescript(f'''
+        UPDATE papers SET identity_key = paper_identity_key(title, authors, year, link)
+        WHERE identity_key IS NULL;
+        CREATE INDEX IF NOT EXISTS idx_papers_identity_tmp ON papers(identity_key);
+        UPDATE papers SET
+            citations = (SELECT MAX(COALESCE(d.citations, 0)) FROM papers d
+                         WHERE d.identity_key = papers.identity_key),
+            abstract = (SELECT d.abstract FROM papers d WHERE d.identity_key = papers.identity_key
+                        ORDER BY LENGTH(COALESCE(d.abstract, '')) DESC, d.id LIMIT 1){first_values}
+        WHERE id IN (SELECT MIN(id) FROM papers GROUP BY identity_key HAVING COUNT(*) > 1);
+        DELETE FROM papers WHERE id NOT IN (SELECT MIN(id) FROM papers GROUP BY identity_key);
+        DROP INDEX idx_papers_identity_tmp;
+        CREATE UNIQUE INDEX idx_papers_identity ON papers(identity_key);
+    ''')
+
+def ensure_fts_index(conn):
+    """
+    Creates the FTS5 tables (papers_fts, projects_fts) and their sync triggers if missing.
+
+    The FTS tables are external-content tables over papers/projects, so the text is
+    stored only once. A newly created index is filled from the existing rows, which
+    makes this the migration path for databases created before full-text search.
+    """
+    for table, columns in FTS_COLUMNS.items():
+        fts = f"{table}_fts"
+        cols = ", ".join(columns)
+        new_cols = ", ".join(f"new.{c}" for c in columns)
+        old_cols = ", ".join(f"old.{c}" for c in columns)
+        exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (fts,)
+        ).fetchone()
+        conn.executescript(f'''
+            CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(
+                {cols}, content='{table}', content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2'
+            );
+            CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN
+                INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new_cols});
+            END;
+            CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN
+                INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_cols});
+            END;
+            CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {cols} ON {table} BEGIN
+                INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_cols});
+                INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new_cols});
+            END;
+        ''')
+        if not exists:
+            conn.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+def ensure_paper_schema(conn):
+    """
+    Adds the typed, normalized parts of the papers schema if missing: the doi and
+    title_norm columns, the authors / paper_authors tables and the indexes behind
+    the source, year, link, DOI and author lookups.
+
+    On a database created before them this coerces every stored year to an int
+    (or NULL), fills doi and title_norm, and splits the authors text of every
+    paper into paper_authors, MIGRATION_CHUNK rows at a time, so it runs once per
+    database and in bounded memory. author_words indexes each word of an author's
+    name for the author filter of the search functions.
+    """
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(papers)")]
+    for column in ("doi", "title_norm"):
+        if column not in columns:
+            conn.execute(f"ALTER TABLE papers ADD COLUMN {column} TEXT")
+    migrated = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'idx_papers_year'").fetchone()
+    has_words = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'author_words'").fetchone()
+    conn.executescript('''
+        CREATE TABLE IF NOT EXISTS authors (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            name_norm TEXT NOT NULL UNIQUE
+        );
+        CREATE TABLE IF NOT EXISTS paper_authors (
+            paper_id INTEGER NOT NULL REFERENCES papers(id) ON DELETE CASCADE,
+            author_id INTEGER NOT NULL REFERENCES authors(id),
+            position INTEGER NOT NULL,
+            PRIMARY KEY (paper_id, position)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS author_words (
+            word TEXT NOT NULL,
+            author_id INTEGER NOT NULL REFERENCES authors(id),
+            PRIMARY KEY (word, author_id)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS idx_paper_authors_author ON paper_authors(author_id);
+        CREATE INDEX IF NOT EXISTS idx_papers_source_year ON papers(source, year);
+        CREATE INDEX IF NOT EXISTS idx_papers_link ON papers(link);
+        CREATE INDEX IF NOT EXISTS idx_papers_doi ON papers(doi);
+        CREATE INDEX IF NOT EXISTS idx_papers_title_norm ON papers(title_norm);
+    ''')
+    if migrated and not has_words:
+        # Migrated before author_words existed: index the names already stored
+        _index_author_words(conn, conn.execute("SELECT id, name_norm FROM authors"))
+    if migrated:
+        return
+
+    # Only a change to the indexed text should touch the full-text index; older
+    # databases re-indexed every row on any UPDATE, including the backfill below
+    conn.execute("DROP TRIGGER IF EXISTS papers_fts_au")
+    ensure_fts_index(conn)
+    conn.create_function("coerce_year", 1, coerce_year)
+    conn.create_function("normalize_title", 1, normalize_title)
+    conn.create_function("normalize_doi", 2, normalize_doi)
+    conn.execute('''
+        UPDATE papers SET
+            year = coerce_year(year),
+            title_norm = normalize_title(title),
+            doi = COALESCE(doi, normalize_doi(CASE WHEN identity_key LIKE 'doi:%'
+                                                   THEN substr(identity_key, 5) END, link))
+    ''')
+    reader = conn.execute(
+        "SELECT id, authors, source FROM papers WHERE id NOT IN (SELECT paper_id FROM paper_authors)")
+    while True:
+        rows = reader.fetchmany(MIGRATION_CHUNK)
+        if not rows:
+            break
+        _link_author_rows(conn, rows)
+    conn.execute("CREATE INDEX idx_papers_year ON papers(year)")
+
+def _index_author_words(conn, authors):
+    """Adds the words of (author id, name_norm) rows to author_words."""
+    conn.executemany("INSERT OR IGNORE INTO author_words (word, author_id) VALUES (?, ?)",
+                     ((word, author_id) for author_id, name_norm in authors for word in set(name_norm.split())))
+
+def _link_author_rows(conn, rows):
+    """Writes paper_authors for (paper id, authors text, source) rows, adding unseen authors."""
+    names, links = {}, []
+    for paper_id, authors, source in rows:
+        for position, name in enumerate(split_authors(authors, source)):
+            name_norm = _normalize_text(name)
+            names.setdefault(name_norm, name)
+            links.append((paper_id, position, name_norm))
+    conn.executemany("INSERT OR IGNORE INTO authors (name, name_norm) VALUES (?, ?)",
+                     [(name, name_norm) for name_norm, name in names.items()])
+    conn.executemany("INSERT OR IGNORE INTO author_words (word, author_id) SELECT ?, id FROM authors WHERE name_norm = ?",
+                     [(word, name_norm) for name_norm in names for word in set(name_norm.split())])
+    conn.executemany(
+        "INSERT OR IGNORE INTO paper_authors (paper_id, author_id, position) "
+        "SELECT ?, id, ? FROM authors WHERE name_norm = ?", links)
+
+def link_authors(conn, identity_keys, replace=False):
+    """
+    Keeps paper_authors in step with the authors text of the given papers.
+
+    Papers that already have author rows are left alone, the same way the upsert
+    keeps the first stored authors; replace=True rebuilds them, for callers that
+    have just rewritten papers.authors.
+    """
+    identity_keys = list(identity_keys)
+    for i in range(0, len(identity_keys), 500):
+        chunk = identity_keys[i:i + 500]
+        marks = ", ".join("?" * len(chunk))
+        if replace:
+            conn.execute(f"DELETE FROM paper_authors WHERE paper_id IN "
+                         f"(SELECT id FROM papers WHERE identity_key IN ({marks}))", chunk)
+        rows = conn.execute(f'''
+            SELECT id, authors, source FROM papers p
+            WHERE identity_key IN ({marks})
+              AND NOT EXISTS (SELECT 1 FROM paper_authors pa WHERE pa.paper_id = p.id)
+        ''', chunk).fetchall()
+        _link_author_rows(conn, rows)
+
+def stored_links(links, db_path=DB_PATH):
+    """The subset of `links` that already belong to a stored paper."""
+    links = [link for link in links if link]
+    found = set()
+    conn = sqlite3.connect(db_path)
+    try:
+        for i in range(0, len(links), 500):
+            chunk = links[i:i + 500]
+            found.update(link for (link,) in conn.execute(
+                f"SELECT link FROM papers WHERE link IN ({', '.join('?' * len(chunk))})", chunk))
+    finally:
+        conn.close()
+    return found
+
+def rebuild_fts_index(db_path=DB_PATH):
+    """Rebuilds the full-text index of an existing database from scratch."""
+    conn = sqlite3.connect(db_path)
+    ensure_fts_index(conn)
+    for table in FTS_COLUMNS:
+        conn.execute(f"INSERT INTO {table}_fts({table}_fts) VALUES ('rebuild')")
     conn.commit()
     conn.close()
+    print("Full-text index rebuilt successfully!")
+
+def paper_row(title, authors, year, source, link, abstract, keywords, citations=0, doi=None):
+    """The PAPER_COLUMNS + DERIVED_COLUMNS tuple stored for one paper, with the year coerced."""
+    year = coerce_year(year)
+    return (title, authors, year, source, link, abstract, keywords, citations,
+            normalize_doi(doi, link), normalize_title(title), paper_identity_key(title, authors, year, link, doi))
+
+def write_papers(conn, rows):
+    """Upserts paper_row() tuples and links their authors, in the caller's transaction."""
+    conn.executemany(PAPER_UPSERT_SQL, rows)
+    link_authors(conn, {row[-1] for row in rows})
+
+def insert_paper(title, authors, year, source, link, abstract, keywords, citations=0, doi=None, db_path=DB_PATH):
+    """Inserts one paper, or merges it into the stored row with the same identity key."""
+    conn = sqlite3.connect(db_path)
+    with conn:
+        write_papers(conn, [paper_row(title, authors, year, source, link, abstract, keywords, citations, doi)])
+    conn.close()
+
+class PaperSink:
+    """
+    Buffered writer for the papers table.
+
+    Rows are upserted on their identity key (see paper_identity_key), so a paper
+    seen again is merged into the stored row instead of being duplicated.
+
+    Keeps one connection open in WAL mode and writes buffered rows with a single
+    executemany per transaction, either once `batch_size` rows are waiting or when
+    `flush_interval` seconds have passed since the last flush. Everything still
+    buffered is flushed when the sink is closed (or the `with` block exits).
+
+    The sink is thread-safe, so several fetchers running in worker threads can
+    share one instance.
+
+    With dedup=True every flush also runs utils.Near_Duplicates over the new rows,
+    in the same transaction, so cross-source near-duplicates are clustered as
+    they arrive. The first flush catches up on papers stored before that.
+
+    Usage:
+        with PaperSink() as sink:
+            sink.add(title=..., authors=..., ...)
+    """
+
+    def __init__(self, db_path=DB_PATH, batch_size=500, flush_interval=5.0, dedup=False):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.inserted = 0
+        self._buffer = []
+        self._last_flush = time.monotonic()
+        self._lock = threading.RLock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        # WAL + NORMAL only fsyncs at checkpoints, which is safe against app crashes
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        with self.conn:
+            ensure_identity_index(self.conn)
+            ensure_paper_schema(self.conn)
+            if dedup:
+                from utils.Near_Duplicates import NearDuplicateIndex
+                self._dedup = NearDuplicateIndex(self.conn)
+            else:
+                self._dedup = None
+
+    def add(self, title, authors, year, source, link, abstract, keywords, citations=0, doi=None):
+        """Queue one paper; same arguments as insert_paper."""
+        row = paper_row(title, authors, year, source, link, abstract, keywords, citations, doi)
+        with self._lock:
+            self._buffer.append(row)
+            if (len(self._buffer) >= self.batch_size
+                    or time.monotonic() - self._last_flush >= self.flush_interval):
+                self.flush()
+
+    def add_many(self, records):
+        """Queue several papers given as dicts keyed by PAPER_COLUMNS (citations and doi optional)."""
+        for record in records:
+            self.add(**{column: record.get(column, 0 if column == "citations" else None)
+                        for column in PAPER_COLUMNS}, doi=record.get("doi"))
+
+    def flush(self):
+        """Write all buffered rows in one transaction."""
+        with self._lock:
+            if self._buffer:
+                rows, self._buffer = self._buffer, []
+                with METRICS.timer("db_write_seconds", table="papers"):
+                    with self.conn:
+                        write_papers(self.conn, rows)
+                        if self._dedup is not None:
+                            self._dedup.update()
+                self.inserted += len(rows)
+                for source, count in Counter(row[3] for row in rows).items():
+                    METRICS.inc("records_inserted_total", count, source=source)
+            self._last_flush = time.monotonic()
+
+    def close(self):
+        with self._lock:
+            if self.conn is None:
+                return
+            try:
+                self.flush()
+            finally:
+                self.conn.close()
+                self.conn = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+@contextmanager
+def open_sink(sink=None, db_path=DB_PATH, **options):
+    """
+    Yields `sink` unchanged if one was passed in (the caller owns and closes it),
+    otherwise opens a PaperSink on `db_path` with `options` for the duration of the block.
+    """
+    if sink is not None:
+        yield sink
+        return
+    with PaperSink(db_path, **options) as own_sink:
+        yield own_sink
 
 def insert_project(title, institution, country, start_year, end_year, researchers, link, abstract, keywords):
     conn = sqlite3.connect("research.db")
@@ -66,56 +509,162 @@ def insert_project(title, institution, country, start_year, end_year, researcher
     conn.commit()
     conn.close()
 
-def search_papers(keyword):
-    conn = sqlite3.connect("research.db")
-    cursor = conn.cursor()
-    cursor.execute('''
-        SELECT * FROM papers WHERE title LIKE ? OR authors LIKE ? OR abstract LIKE ? OR keywords LIKE ?
-    ''', (f'%{keyword}%', f'%{keyword}%', f'%{keyword}%', f'%{keyword}%'))
-    results = cursor.fetchall()
-    conn.close()
-    return results
+# ---------------- Crawl watermarks ----------------
 
-def search_projects(keyword):
-    conn = sqlite3.connect("research.db")
+def ensure_crawl_state(conn):
+    """Creates the table holding one watermark per (source, query)."""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS crawl_state (
+            source TEXT NOT NULL,
+            query TEXT NOT NULL,
+            watermark TEXT NOT NULL,
+            records INTEGER,
+            updated_at TEXT,
+            PRIMARY KEY (source, query)
+        )
+    ''')
+
+def get_watermark(source, query, db_path=DB_PATH):
+    """Date (YYYY-MM-DD) of the last complete run of `query` on `source`, or None."""
+    conn = sqlite3.connect(db_path)
+    try:
+        ensure_crawl_state(conn)
+        row = conn.execute("SELECT watermark FROM crawl_state WHERE source = ? AND query = ?",
+                           (source, query)).fetchone()
+        return row[0] if row else None
+    finally:
+        conn.close()
+
+def set_watermark(source, query, watermark, records=None, db_path=DB_PATH):
+    """Records that everything up to `watermark` has been harvested for (source, query)."""
+    conn = sqlite3.connect(db_path)
+    try:
+        with conn:
+            ensure_crawl_state(conn)
+            conn.execute(
+                "INSERT OR REPLACE INTO crawl_state VALUES (?, ?, ?, ?, datetime('now'))",
+                (source, query, watermark, records),
+            )
+    finally:
+        conn.close()
+
+def to_fts_query(text):
+    """
+    Turns a search string into an FTS5 MATCH expression.
+
+    Words are quoted so punctuation can't break the query syntax, "quoted phrases"
+    stay phrase queries, a trailing * keeps prefix matching (e.g. genom*), and
+    upper-case AND / OR / NOT between two terms are passed through as operators.
+    An operator with no term on one side ("C++ AND", "NOT") is searched as a word,
+    so no input can produce an invalid query. Returns "" when nothing searchable
+    is left (e.g. '""' or '*'), which callers must not pass to MATCH.
+    """
+    tokens = []
+    for token in re.findall(r'"[^"]*"\*?|\S+', text):
+        if token in ("AND", "OR", "NOT"):
+            tokens.append((True, token))
+            continue
+        if token.startswith('"') and token.rstrip("*").endswith('"') and len(token.rstrip("*")) > 1:
+            prefix = token.endswith("*")
+            word = token.rstrip("*")[1:-1]
+        else:
+            prefix = token.endswith("*")
+            word = token.rstrip("*")
+        if word.strip():
+            tokens.append((False, f'"{word.replace(chr(34), chr(34) * 2)}"' + ("*" if prefix else "")))
+    terms = []
+    for i, (operator, token) in enumerate(tokens):
+        if operator:
+            follows_term = bool(terms) and terms[-1] not in ("AND", "OR", "NOT")
+            precedes_term = i + 1 < len(tokens) and not tokens[i + 1][0]
+            if not (follows_term and precedes_term):
+                token = f'"{token}"'
+        terms.append(token)
+    return " ".join(terms)
+
+def _paper_filters(source=None, year_from=None, year_to=None, author=None):
+    """SQL conditions on papers (aliased t) and their parameters; each uses an index."""
+    conditions, params = [], []
+    if source is not None:
+        conditions.append("t.source = ?")
+        params.append(source)
+    if year_from is not None:
+        conditions.append("t.year >= ?")
+        params.append(int(year_from))
+    if year_to is not None:
+        conditions.append("t.year <= ?")
+        params.append(int(year_to))
+    if author:
+        # Whole-word match, so "smith" finds "John Smith" and "Smith J" but not "Smithson".
+        # author_words narrows it to the authors with the query's longest word first
+        name = _normalize_text(author)
+        conditions.append('''t.id IN (SELECT pa.paper_id FROM author_words w
+                                    JOIN authors a ON a.id = w.author_id
+                                    JOIN paper_authors pa ON pa.author_id = a.id
+                                    WHERE w.word = ? AND instr(' ' || a.name_norm || ' ', ?) > 0)''')
+        params += [max(name.split(), key=len, default=""), f" {name} "]
+    return conditions, params
+
+def _search_fts(table, keyword, limit, offset, snippets, db_path, conditions=(), params=()):
+    fts = f"{table}_fts"
+    weights = ", ".join(str(w) for w in FTS_COLUMNS[table].values())
+    snippet = f", snippet({fts}, -1, '<b>', '</b>', '...', 16)" if snippets else ""
+    where = "".join(f" AND {c}" for c in conditions)
+    query = to_fts_query(keyword or "")
+    if not query:
+        # Nothing searchable left, e.g. only quotes or asterisks
+        return []
+    conn = sqlite3.connect(db_path)
     cursor = conn.cursor()
-    cursor.execute('''
-        SELECT * FROM projects WHERE title LIKE ? OR institution LIKE ? OR abstract LIKE ? OR keywords LIKE ?
-    ''', (f'%{keyword}%', f'%{keyword}%', f'%{keyword}%', f'%{keyword}%'))
+    cursor.execute(f'''
+        SELECT t.*{snippet} FROM {fts}
+        JOIN {table} t ON t.id = {fts}.rowid
+        WHERE {fts} MATCH ?{where}
+        ORDER BY bm25({fts}, {weights})
+        LIMIT ? OFFSET ?
+    ''', (query, *params, -1 if limit is None else limit, offset))
     results = cursor.fetchall()
     conn.close()
     return results
 
-def export_to_excel(db_path="research.db", output_file="research_results.xlsx"):
-    conn = sqlite3.connect(db_path)
-    papers_df = pd.read_sql_query("SELECT * FROM papers", conn)
-    projects_df = pd.read_sql_query("SELECT * FROM projects", conn)
-    conn.close()
-    
-    with pd.ExcelWriter(output_file) as writer:
-        papers_df.to_excel(writer, sheet_name="Papers", index=False)
-        projects_df.to_excel(writer, sheet_name="Projects", index=False)
-
+def search_papers(keyword=None, limit=None, offset=0, snippets=False, source=None, year_from=None, year_to=None,
+                  author=None, db_path=DB_PATH):
+    """
+    Full-text search over title, authors, abstract and keywords, best BM25 match first.
 
+    `keyword` accepts words, "exact phrases" and prefix* terms (see to_fts_query).
+    With snippets=True each row gets an extra trailing column holding the matching
+    text with hits wrapped in <b>...</b>. By default every match is returned;
+    `limit` / `offset` page through them.
 
-def remove_duplicates_from_db():
-    conn = sqlite3.connect("research.db")  # Change to PostgreSQL connection if needed
-    cursor = conn.cursor()
-    
-    # Deduplication logic: Keep the first occurrence of (title, authors, source)
-    query = """
-    DELETE FROM papers
-    WHERE rowid NOT IN (
-        SELECT MIN(rowid)
-        FROM papers
-        GROUP BY title, authors, source
-    );
+    source, year_from / year_to (inclusive) and author (whole words of a name)
+    narrow the matches. Without a keyword they select papers on their own, newest
+    first, through the source/year and author indexes instead of the text index.
+    A keyword with nothing searchable in it ('""', '*') matches nothing unless
+    one of those filters is given.
     """
-    
-    cursor.execute(query)
-    conn.commit()
-    conn.close()
-    print("Duplicates removed successfully!")
+    conditions, params = _paper_filters(source, year_from, year_to, author)
+    if to_fts_query(keyword or ""):
+        return _search_fts("papers", keyword, limit, offset, snippets, db_path, conditions, params)
+    if keyword and not conditions:
+        return []
+    where = " WHERE " + " AND ".join(conditions) if conditions else ""
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute(
+            f"SELECT t.* FROM papers t{where} ORDER BY t.year DESC, t.id DESC LIMIT ? OFFSET ?",
+            (*params, -1 if limit is None else limit, offset)).fetchall()
+    finally:
+        conn.close()
+
+def search_projects(keyword, limit=None, offset=0, snippets=False, db_path=DB_PATH):
+    """Same as search_papers, over title, institution, abstract and keywords of projects."""
+    return _search_fts("projects", keyword, limit, offset, snippets, db_path)
+
+def export_to_excel(db_path=DB_PATH, output_file="research_results.xlsx"):
+    """Writes papers and projects to one workbook; streams rows, see utils/Export_DB.py."""
+    from utils.Export_DB import export_tables
+    return export_tables(output_file, fmt="xlsx", db_path=db_path)
 
 if __name__ == "__main__":
     create_database()
@@ -1,3 +1,238 @@
-from Database_Calls import export_to_excel
+import sys
+import os
+import re
+import csv
+import json
+import argparse
+import sqlite3
+from openpyxl import Workbook
+from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
 
-export_to_excel()
\ No newline at end of file
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.Database_Calls import DB_PATH
+
+CHUNK_SIZE = 10000
+# Year expression used by the year_from / year_to filters of each table. papers.year
+# is stored as an int, so it is compared as is and can use idx_papers_year
+YEAR_COLUMNS = {"papers": "year", "projects": "CAST(start_year AS INTEGER)"}
+SHEET_NAMES = {"papers": "Papers", "projects": "Projects"}
+# Data rows per worksheet (Excel's limit minus the header); extra rows go to a new sheet
+EXCEL_MAX_ROWS = 1048575
+FORMATS = {".xlsx": "xlsx", ".csv": "csv", ".jsonl": "jsonl", ".parquet": "parquet"}
+
+def _table_columns(conn, table):
+    """[(name, declared type)] of `table`, which doubles as a whitelist for column names."""
+    columns = [(row[1], row[2].upper()) for row in conn.execute(f"PRAGMA table_info({table})")]
+    if not columns:
+        raise ValueError(f"Unknown table: {table}")
+    return columns
+
+def iter_rows(conn, table, columns=None, where=None, params=(), year_from=None, year_to=None,
+              chunk_size=CHUNK_SIZE):
+    """
+    Streams rows of `table` in chunks of `chunk_size`, never holding more than one chunk.
+
+    - columns: subset of column names to export (default: all).
+    - where / params: extra SQL condition, e.g. where="source = ?", params=("Crossref",).
+    - year_from / year_to: inclusive bounds on the table's year column (see YEAR_COLUMNS).
+
+    Returns:
+      (column names, iterator over lists of row tuples)
+    """
+    available = dict(_table_columns(conn, table))
+    columns = list(columns or available)
+    unknown = [c for c in columns if c not in available]
+    if unknown:
+        raise ValueError(f"Unknown column(s) for {table}: {', '.join(unknown)}")
+
+    conditions, args = [], list(params)
+    if where:
+        conditions.append(f"({where})")
+    year_column = YEAR_COLUMNS.get(table)
+    if year_from is not None:
+        conditions.append(f"{year_column} >= ?")
+        args.append(year_from)
+    if year_to is not None:
+        conditions.append(f"{year_column} <= ?")
+        args.append(year_to)
+    sql = f"SELECT {', '.join(columns)} FROM {table}"
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+
+    cursor = conn.execute(sql, args)
+
+    def chunks():
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield rows
+
+    return columns, chunks()
+
+# ---------------- Writers ----------------
+
+def _clean_cell(value):
+    # openpyxl refuses control characters that show up in scraped abstracts
+    return ILLEGAL_CHARACTERS_RE.sub("", value) if isinstance(value, str) else value
+
+def _write_xlsx_sheets(workbook, title, columns, chunks):
+    sheet, written, part = None, EXCEL_MAX_ROWS, 1
+    total = 0
+    for rows in chunks:
+        for row in rows:
+            if written >= EXCEL_MAX_ROWS:
+                sheet = workbook.create_sheet(title if part == 1 else f"{title} ({part})")
+                sheet.append(columns)
+                written, part = 0, part + 1
+            sheet.append([_clean_cell(v) for v in row])
+            written += 1
+            total += 1
+    if sheet is None:
+        workbook.create_sheet(title).append(columns)
+    return total
+
+def _write_csv(output_file, columns, chunks):
+    total = 0
+    with open(output_file, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        for rows in chunks:
+            writer.writerows(rows)
+            total += len(rows)
+    return total
+
+def _write_jsonl(output_file, columns, chunks):
+    total = 0
+    with open(output_file, "w", encoding="utf-8") as f:
+        for rows in chunks:
+            f.writelines(json.dumps(dict(zip(columns, row)), ensure_ascii=False) + "\n" for row in rows)
+            total += len(rows)
+    return total
+
+def _to_int(value):
+    # Scraped years can be "2021-01-01" or "Unknown"; keep the leading number if any
+    if value is None or isinstance(value, int):
+        return value
+    match = re.match(r"\s*(-?\d+)", str(value))
+    return int(match.group(1)) if match else None
+
+def _write_parquet(output_file, columns, types, chunks):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet export needs pyarrow (pip install pyarrow)")
+    integer = [types[c].startswith("INT") for c in columns]
+    schema = pa.schema([(c, pa.int64() if is_int else pa.string()) for c, is_int in zip(columns, integer)])
+    total = 0
+    with pq.ParquetWriter(output_file, schema) as writer:
+        for rows in chunks:
+            arrays = []
+            for i, is_int in enumerate(integer):
+                values = [row[i] for row in rows]
+                values = [_to_int(v) for v in values] if is_int else [None if v is None else str(v) for v in values]
+                arrays.append(pa.array(values, type=schema.field(i).type))
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            total += len(rows)
+    return total
+
+# ---------------- Export entry points ----------------
+
+def _format_of(output_file, fmt):
+    fmt = fmt or FORMATS.get(os.path.splitext(output_file)[1].lower())
+    if fmt not in FORMATS.values():
+        raise ValueError(f"Unsupported export format for {output_file}; use one of {', '.join(FORMATS.values())}")
+    return fmt
+
+def export_tables(output_file="research_results.xlsx", tables=("papers", "projects"), fmt=None,
+                  columns=None, where=None, params=(), year_from=None, year_to=None,
+                  db_path=DB_PATH, chunk_size=CHUNK_SIZE):
+    """
+    Exports tables in constant memory.
+
+    xlsx writes one sheet per table into `output_file` (openpyxl write-only mode);
+    csv, jsonl and parquet write one file per table, named <output stem>_<table>.<ext>.
+    The format comes from `fmt` or the file extension. `columns` is either a list
+    shared by every table that has them or a {table: [columns]} dict. `where` is
+    either a condition for every table or a {table: condition} dict (with
+    `params` a matching {table: params} dict), so a condition on papers' columns
+    isn't run against projects; the other filters are those of iter_rows.
+
+    Returns:
+      {table: number of exported rows}
+    """
+    fmt = _format_of(output_file, fmt)
+    conn = sqlite3.connect(db_path)
+    counts = {}
+    workbook = Workbook(write_only=True) if fmt == "xlsx" else None
+    try:
+        for table in tables:
+            table_columns = columns.get(table) if isinstance(columns, dict) else columns
+            if table_columns and not isinstance(columns, dict):
+                # A shared list only picks the columns this table actually has
+                available = dict(_table_columns(conn, table))
+                table_columns = [c for c in table_columns if c in available] or table_columns
+            year_filters = {"year_from": year_from, "year_to": year_to} if table in YEAR_COLUMNS else {}
+            table_where = where.get(table) if isinstance(where, dict) else where
+            table_params = params.get(table, ()) if isinstance(params, dict) else params
+            names, chunks = iter_rows(conn, table, table_columns, table_where, table_params,
+                                      chunk_size=chunk_size, **year_filters)
+            if fmt == "xlsx":
+                counts[table] = _write_xlsx_sheets(workbook, SHEET_NAMES.get(table, table), names, chunks)
+                continue
+            stem, ext = os.path.splitext(output_file)
+            path = f"{stem}_{table}{ext or '.' + fmt}"
+            if fmt == "csv":
+                counts[table] = _write_csv(path, names, chunks)
+            elif fmt == "jsonl":
+                counts[table] = _write_jsonl(path, names, chunks)
+            else:
+                types = dict(_table_columns(conn, table))
+                counts[table] = _write_parquet(path, names, types, chunks)
+            print(f"Exported {counts[table]} {table} rows to {path}")
+        if workbook is not None:
+            workbook.save(output_file)
+            print(f"Exported {counts} rows to {output_file}")
+    finally:
+        conn.close()
+    return counts
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export research.db tables in constant memory.")
+    parser.add_argument("output", nargs="?", default="research_results.xlsx",
+                        help="output file; the extension picks the format (.xlsx, .csv, .jsonl, .parquet)")
+    parser.add_argument("--format", choices=sorted(set(FORMATS.values())))
+    parser.add_argument("--tables", default="papers,projects")
+    parser.add_argument("--columns", help="comma-separated columns to export")
+    parser.add_argument("--where", action="append", default=[],
+                        help="extra SQL condition for one table, e.g. \"papers:source = 'Crossref'\"; "
+                             "without a table prefix it applies to every table (repeatable)")
+    parser.add_argument("--year-from", type=int)
+    parser.add_argument("--year-to", type=int)
+    parser.add_argument("--db", default=DB_PATH)
+    args = parser.parse_args()
+
+    tables = args.tables.split(",")
+    where = {}
+    for condition in args.where:
+        table, sep, rest = condition.partition(":")
+        # Only a known table name counts as a prefix; conditions may contain colons themselves
+        if sep and table.strip() in tables:
+            targets, condition = [table.strip()], rest
+        else:
+            targets = tables
+        for target in targets:
+            where[target] = f"{where[target]} AND ({condition})" if target in where else f"({condition})"
+
+    export_tables(
+        args.output,
+        tables=tables,
+        fmt=args.format,
+        columns=args.columns.split(",") if args.columns else None,
+        where=where,
+        year_from=args.year_from,
+        year_to=args.year_to,
+        db_path=args.db,
+    )
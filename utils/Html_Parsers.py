@@ -0,0 +1,155 @@
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from bs4 import BeautifulSoup, SoupStrainer
+
+try:
+    import lxml.html
+except ImportError:  # lxml is optional; the strainer backend needs only bs4
+    lxml = None
+
+# Backends in order of preference when none is configured
+PREFERRED_BACKENDS = ["lxml", "strainer"]
+# Below this many pages a process pool costs more than it saves
+MIN_POOL_BATCH = 8
+
+# ---------------- Reference backend: the original full BeautifulSoup parse ----------------
+
+def _paperity_soup(html, parse_only=None):
+    soup = BeautifulSoup(html, "html.parser", parse_only=parse_only)
+    rows = []
+    for article in soup.find_all("div", class_="row"):
+        title_element = article.find("h2", class_="paper-list-title")
+        link_element = title_element.find("a") if title_element else None
+        author_element = article.find("p", class_="bib-authors")
+        date_element = article.find("p", class_="bib-date")
+        rows.append({
+            "title": title_element.get_text(strip=True) if title_element else "Unknown",
+            "href": link_element.get("href") if link_element else None,
+            "authors": author_element.get_text(strip=True) if author_element else "Unknown",
+            "date": date_element.get_text(strip=True) if date_element else "Unknown",
+        })
+    return rows
+
+def _universityguru_soup(html, parse_only=None):
+    soup = BeautifulSoup(html, "html.parser", parse_only=parse_only)
+    return [uni.text.strip() for uni in soup.select("div.university-name a")]
+
+# ---------------- Strainer backend: html.parser, but only the result containers ----------------
+
+def _class_filter(name):
+    # While straining, html.parser hands over the raw attribute ("row paper-list-item"),
+    # so a plain class_="row" only matches single-class elements
+    return lambda value: value is not None and name in value.split()
+
+def _paperity_strainer(html):
+    return _paperity_soup(html, SoupStrainer("div", class_=_class_filter("row")))
+
+def _universityguru_strainer(html):
+    return _universityguru_soup(html, SoupStrainer("div", class_=_class_filter("university-name")))
+
+# ---------------- lxml backend ----------------
+
+def _has_class(name):
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+def _lxml_tree(html):
+    if not html or not html.strip():
+        return None
+    try:
+        return lxml.html.fromstring(html)
+    except ValueError:
+        # lxml refuses str input that carries an XML encoding declaration
+        return lxml.html.fromstring(html.encode("utf-8"))
+
+def _stripped_text(element):
+    """Same as BeautifulSoup's get_text(strip=True)."""
+    return "".join(t.strip() for t in element.xpath(".//text()") if t.strip())
+
+def _first(element, xpath):
+    found = element.xpath(xpath)
+    return found[0] if found else None
+
+def _paperity_lxml(html):
+    tree = _lxml_tree(html)
+    if tree is None:
+        return []
+    rows = []
+    for article in tree.xpath(f"descendant-or-self::div[{_has_class('row')}]"):
+        title_element = _first(article, f".//h2[{_has_class('paper-list-title')}]")
+        link_element = _first(title_element, ".//a") if title_element is not None else None
+        author_element = _first(article, f".//p[{_has_class('bib-authors')}]")
+        date_element = _first(article, f".//p[{_has_class('bib-date')}]")
+        rows.append({
+            "title": _stripped_text(title_element) if title_element is not None else "Unknown",
+            "href": link_element.get("href") if link_element is not None else None,
+            "authors": _stripped_text(author_element) if author_element is not None else "Unknown",
+            "date": _stripped_text(date_element) if date_element is not None else "Unknown",
+        })
+    return rows
+
+def _universityguru_lxml(html):
+    tree = _lxml_tree(html)
+    if tree is None:
+        return []
+    links = tree.xpath(f"descendant-or-self::div[{_has_class('university-name')}]//a")
+    return ["".join(a.xpath(".//text()")).strip() for a in links]
+
+# ---------------- Backend registry ----------------
+
+BACKENDS = {
+    "soup": {"paperity": _paperity_soup, "universityguru": _universityguru_soup},
+    "strainer": {"paperity": _paperity_strainer, "universityguru": _universityguru_strainer},
+}
+if lxml is not None:
+    BACKENDS["lxml"] = {"paperity": _paperity_lxml, "universityguru": _universityguru_lxml}
+
+_backend = None
+_lock = threading.Lock()
+
+def register_backend(name, **parsers):
+    """
+    Adds or replaces a backend. `parsers` maps a page type ("paperity",
+    "universityguru") to a function taking the page's HTML text.
+    """
+    BACKENDS[name] = dict(parsers)
+
+def configure_parser(backend=None):
+    """Selects the backend used when none is passed; None picks the fastest installed one."""
+    global _backend
+    if backend is not None and backend not in BACKENDS:
+        raise ValueError(f"Unknown HTML parser backend: {backend} (available: {', '.join(BACKENDS)})")
+    with _lock:
+        _backend = backend
+
+def current_backend():
+    return _backend or next(b for b in PREFERRED_BACKENDS if b in BACKENDS)
+
+def parse(page_type, html, backend=None):
+    """Extracts the records of one `page_type` page with `backend` (default: current_backend())."""
+    return BACKENDS[backend or current_backend()][page_type](html)
+
+def parse_paperity(html, backend=None):
+    """
+    Returns one dict per div.row of a Paperity search page:
+      {"title", "href", "authors", "date"}, with "Unknown" (href None) for missing parts.
+    """
+    return parse("paperity", html, backend)
+
+def parse_universityguru(html, backend=None):
+    """Returns the university names listed on a universityguru country page."""
+    return parse("universityguru", html, backend)
+
+def _parse_args(args):
+    return parse(*args)
+
+def parse_many(page_type, pages, backend=None, workers=None):
+    """
+    Parses a batch of pages, in a process pool of `workers` processes when given
+    and the batch is large enough to be worth it. Results keep the order of `pages`.
+    """
+    backend = backend or current_backend()
+    if not workers or len(pages) < MIN_POOL_BATCH:
+        return [parse(page_type, html, backend) for html in pages]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        chunksize = max(1, len(pages) // (workers * 4))
+        return list(pool.map(_parse_args, [(page_type, html, backend) for html in pages], chunksize=chunksize))
@@ -0,0 +1,204 @@
+import hashlib
+import io
+import json
+import sqlite3
+import threading
+import time
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+import requests
+from requests.structures import CaseInsensitiveDict
+
+CACHE_PATH = "http_cache.db"
+DEFAULT_TTL = 24 * 3600
+# Seconds a cached response is served without asking the server again, per source
+SOURCE_TTLS = {
+    "crossref": 24 * 3600,
+    # NCBI drops a WebEnv after ~8 hours; cached pages must not outlive their esearch
+    "pubmed": 8 * 3600,
+    "hal": 24 * 3600,
+    "theses_fr": 24 * 3600,
+    "paperity": 6 * 3600,
+    "universityguru": 7 * 24 * 3600,
+    # The country list practically never changes
+    "geonames": 30 * 24 * 3600,
+}
+DEFAULT_MAX_BYTES = 512 * 1024 ** 2
+# Query parameters that never change the response and must not split cache entries
+IGNORED_PARAMS = {"api_key", "mailto"}
+
+class OfflineCacheMiss(requests.exceptions.RequestException):
+    """Raised in offline mode when a request has no cached response."""
+
+def cache_key(method, url, params=None):
+    """Hash of the method, URL and sorted query parameters (from both `url` and `params`)."""
+    parts = urlsplit(url)
+    query = parse_qsl(parts.query, keep_blank_values=True)
+    if isinstance(params, dict):
+        params = params.items()
+    for name, value in params or ():
+        values = value if isinstance(value, (list, tuple)) else [value]
+        query.extend((name, str(v)) for v in values if v is not None)
+    query = sorted((k, v) for k, v in query if k not in IGNORED_PARAMS)
+    normalized = urlunsplit((parts.scheme, parts.netloc.lower(), parts.path, urlencode(query), ""))
+    return hashlib.sha256(f"{method.upper()} {normalized}".encode()).hexdigest()
+
+def _to_response(url, status, headers, body):
+    response = requests.Response()
+    response.status_code = status
+    response.headers = CaseInsensitiveDict(headers)
+    response.url = url
+    response._content = body
+    # Streaming callers read .raw (e.g. iterparse), so give them the same bytes
+    response.raw = io.BytesIO(body)
+    response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+    response.from_cache = True
+    return response
+
+class ResponseCache:
+    """
+    Persistent cache of successful GET responses in a SQLite file.
+
+    - Fresh entries (younger than the source TTL) are served without any request.
+    - Stale entries with an ETag or Last-Modified are revalidated with a conditional
+      request; a 304 refreshes the entry and serves the stored body.
+    - The total body size is capped at `max_bytes`; least recently used entries go first.
+    - offline=True serves only from the cache, stale or not, and raises OfflineCacheMiss otherwise.
+    - stream=True requests bypass the cache, so their bodies are never buffered in
+      memory; offline they raise OfflineCacheMiss.
+    """
+
+    def __init__(self, path=CACHE_PATH, ttls=None, default_ttl=DEFAULT_TTL,
+                 max_bytes=DEFAULT_MAX_BYTES, offline=False):
+        self.path = path
+        self.ttls = {**SOURCE_TTLS, **(ttls or {})}
+        self.default_ttl = default_ttl
+        self.max_bytes = max_bytes
+        self.offline = offline
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        with self.conn:
+            self.conn.execute('''
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    url TEXT,
+                    status INTEGER,
+                    headers TEXT,
+                    body BLOB,
+                    etag TEXT,
+                    last_modified TEXT,
+                    stored_at REAL,
+                    accessed_at REAL,
+                    size INTEGER
+                )
+            ''')
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses(accessed_at)")
+            # Running total of body sizes, kept by triggers so a store needn't sum the table
+            if not self.conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'cache_size'").fetchone():
+                # One transaction, so a process sharing the file sees the total and triggers together
+                self.conn.executescript('''
+                    BEGIN IMMEDIATE;
+                    CREATE TABLE IF NOT EXISTS cache_size (id INTEGER PRIMARY KEY CHECK (id = 1),
+                                                           total INTEGER NOT NULL);
+                    INSERT OR IGNORE INTO cache_size SELECT 1, COALESCE(SUM(size), 0) FROM responses;
+                    CREATE TRIGGER IF NOT EXISTS responses_size_ai AFTER INSERT ON responses BEGIN
+                        UPDATE cache_size SET total = total + new.size;
+                    END;
+                    CREATE TRIGGER IF NOT EXISTS responses_size_ad AFTER DELETE ON responses BEGIN
+                        UPDATE cache_size SET total = total - old.size;
+                    END;
+                    CREATE TRIGGER IF NOT EXISTS responses_size_au AFTER UPDATE OF size ON responses BEGIN
+                        UPDATE cache_size SET total = total + new.size - old.size;
+                    END;
+                    COMMIT;
+                ''')
+
+    def ttl(self, source):
+        return self.ttls.get(source, self.default_ttl)
+
+    def get(self, send, url, source=None, params=None, headers=None, **kwargs):
+        """
+        Cached equivalent of `send(url, params=..., headers=..., **kwargs)`.
+
+        `send` performs the real request (e.g. requests.get) and is only called on a
+        miss, for a stale entry, or to revalidate one.
+        """
+        if kwargs.get("stream"):
+            # Storing the body would read it all before the caller sees a byte
+            if self.offline:
+                raise OfflineCacheMiss(f"Streamed request {url} is not cached (offline mode)")
+            return send(url, params=params, headers=headers, **kwargs)
+        key = cache_key("GET", url, params)
+        with self._lock:
+            entry = self.conn.execute(
+                "SELECT url, status, headers, body, etag, last_modified, stored_at FROM responses WHERE key = ?",
+                (key,),
+            ).fetchone()
+            if entry is not None:
+                self.conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (time.time(), key))
+                self.conn.commit()
+
+        if entry is not None:
+            cached_url, status, cached_headers, body, etag, last_modified, stored_at = entry
+            cached = _to_response(cached_url, status, json.loads(cached_headers), body)
+            if self.offline or time.time() - stored_at < self.ttl(source):
+                return cached
+        elif self.offline:
+            raise OfflineCacheMiss(f"No cached response for {url} (offline mode)")
+
+        headers = dict(headers or {})
+        if entry is not None:
+            if etag:
+                headers["If-None-Match"] = etag
+            if last_modified:
+                headers["If-Modified-Since"] = last_modified
+        response = send(url, params=params, headers=headers, **kwargs)
+
+        if response.status_code == 304 and entry is not None:
+            with self._lock, self.conn:
+                self.conn.execute("UPDATE responses SET stored_at = ? WHERE key = ?", (time.time(), key))
+            return cached
+        if response.status_code == 200:
+            return self._store(key, response)
+        return response
+
+    def _store(self, key, response):
+        """Saves a 200 response and returns its cached copy."""
+        body = response.content
+        # The stored body is already decoded, so drop headers that describe the wire format
+        stored_headers = {k: v for k, v in response.headers.items()
+                          if k.lower() not in ("content-encoding", "content-length", "transfer-encoding")}
+        now = time.time()
+        with self._lock, self.conn:
+            # An upsert rather than INSERT OR REPLACE, whose implicit delete skips the size triggers
+            self.conn.execute(
+                "INSERT INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT(key) DO UPDATE SET "
+                "url = excluded.url, status = excluded.status, headers = excluded.headers, body = excluded.body, "
+                "etag = excluded.etag, last_modified = excluded.last_modified, stored_at = excluded.stored_at, "
+                "accessed_at = excluded.accessed_at, size = excluded.size",
+                (key, response.url, response.status_code, json.dumps(stored_headers), body,
+                 response.headers.get("ETag"), response.headers.get("Last-Modified"), now, now, len(body)),
+            )
+            self._evict()
+        return _to_response(response.url, response.status_code, stored_headers, body)
+
+    def _evict(self):
+        total = self.conn.execute("SELECT total FROM cache_size").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Walk from least recently used and drop entries until under the cap
+        doomed, freed = [], 0
+        for key, size in self.conn.execute("SELECT key, size FROM responses ORDER BY accessed_at"):
+            doomed.append((key,))
+            freed += size
+            if total - freed <= self.max_bytes:
+                break
+        self.conn.executemany("DELETE FROM responses WHERE key = ?", doomed)
+
+    def clear(self):
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM responses")
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
@@ -0,0 +1,212 @@
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.request import ACCEPT_ENCODING
+from urllib3.util.retry import Retry
+from fake_useragent import UserAgent
+from utils.Http_Cache import ResponseCache
+from utils.Rate_Limit import RATE_LIMITER
+from utils.Metrics import METRICS
+
+# Times a 429/503 response is retried once the host's back-off has passed
+THROTTLE_RETRIES = 2
+
+# (connect, read) timeouts in seconds, used when a call doesn't pass its own
+DEFAULT_TIMEOUT = (5, 15)
+SOURCE_TIMEOUTS = {
+    "crossref": (5, 60),
+    "pubmed": (5, 30),
+    "hal": (5, 30),
+}
+# Keep-alive connections kept per host
+POOL_SIZE = 16
+# Labels of the request _send is making on this thread, for retries counted inside urllib3
+_request_labels = threading.local()
+
+class _CountingRetry(Retry):
+    """Retry that counts each transport retry in http_retries_total, like _send's throttle retries."""
+
+    def increment(self, *args, **kwargs):
+        retry = super().increment(*args, **kwargs)
+        # Only reached when another attempt follows: an exhausted budget raises above
+        labels = getattr(_request_labels, "labels", {})
+        METRICS.inc("http_retries_total", reason="transport", **labels)
+        return retry
+
+# Transport-level retries with exponential backoff (0.5s, 1s, 2s) for dropped
+# connections and 5xx errors. 429/503 are left to _send so the rate limiter sees them.
+TRANSPORT_RETRIES = _CountingRetry(
+    total=3,
+    backoff_factor=0.5,
+    status_forcelist=(500, 502, 504),
+    allowed_methods=frozenset({"GET", "HEAD"}),
+    raise_on_status=False,
+    # Otherwise urllib3 retries a 429/503 with Retry-After itself, behind the rate limiter's back
+    respect_retry_after_header=False,
+)
+
+# In-flight request limits shared by every fetcher thread.
+# None means "unlimited", which is also the behaviour when nothing is configured.
+_global_gate = None
+_source_limit = None
+_source_limits = {}
+_source_gates = {}
+_gates_lock = threading.Lock()
+
+def configure_limits(global_limit=None, per_source_limit=None, source_limits=None):
+    """
+    Sets how many HTTP requests may be in flight at once.
+
+    - global_limit: cap across all sources.
+    - per_source_limit: default cap for any single source.
+    - source_limits: optional {source: limit} overrides of per_source_limit.
+
+    Call this before starting fetchers; requests already in flight keep the old gates.
+    """
+    global _global_gate, _source_limit, _source_limits
+    with _gates_lock:
+        _global_gate = threading.BoundedSemaphore(global_limit) if global_limit else None
+        _source_limit = per_source_limit
+        _source_limits = dict(source_limits or {})
+        _source_gates.clear()
+
+def _source_gate(source):
+    if source is None:
+        return None
+    with _gates_lock:
+        if source not in _source_gates:
+            limit = _source_limits.get(source, _source_limit)
+            _source_gates[source] = threading.BoundedSemaphore(limit) if limit else None
+        return _source_gates[source]
+
+@contextmanager
+def in_flight(source=None):
+    """Holds one slot for `source` and one global slot for the duration of the block."""
+    # Source slot first, so a thread queued behind its own source never sits on a global slot
+    gates = [g for g in (_source_gate(source), _global_gate) if g is not None]
+    for gate in gates:
+        gate.acquire()
+    try:
+        yield
+    finally:
+        for gate in reversed(gates):
+            gate.release()
+
+# On-disk response cache, opened on first use; see configure_cache
+_cache = None
+_cache_enabled = True
+_cache_options = {}
+_cache_lock = threading.Lock()
+
+def configure_cache(enabled=True, **options):
+    """
+    Turns the response cache on or off.
+
+    `options` are passed to utils.Http_Cache.ResponseCache (path, ttls, max_bytes,
+    offline, ...) and take effect on the next request.
+    """
+    global _cache, _cache_enabled, _cache_options
+    with _cache_lock:
+        if _cache is not None:
+            _cache.close()
+        _cache, _cache_enabled, _cache_options = None, enabled, options
+
+def _get_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None and _cache_enabled:
+            _cache = ResponseCache(**_cache_options)
+        return _cache
+
+# ---------------- Transport ----------------
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+def session_for(host, proxied=False):
+    """
+    The pooled keep-alive session of `host`, created on first use. Proxied requests
+    get a session without transport retries, so a dead proxy fails fast and the
+    caller can rotate to another one.
+    """
+    with _sessions_lock:
+        session = _sessions.get((host, proxied))
+        if session is None:
+            session = requests.Session()
+            retries = 0 if proxied else TRANSPORT_RETRIES
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE, max_retries=retries)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            # gzip/deflate, plus brotli when the brotli package is installed
+            session.headers["Accept-Encoding"] = ACCEPT_ENCODING
+            _sessions[(host, proxied)] = session
+        return session
+
+def close_sessions():
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
+
+_user_agents = None
+_user_agents_lock = threading.Lock()
+
+def random_user_agent():
+    """A random browser User-Agent string; the fake_useragent data is loaded only once."""
+    global _user_agents
+    with _user_agents_lock:
+        if _user_agents is None:
+            _user_agents = UserAgent()
+    return _user_agents.random
+
+def _response_bytes(response, streamed):
+    # A streamed body hasn't been read yet, so fall back to its declared length
+    if streamed:
+        return int(response.headers.get("Content-Length") or 0)
+    return len(response.content)
+
+def _send(url, source=None, **kwargs):
+    host = urlsplit(url).netloc
+    session = session_for(host, proxied=bool(kwargs.get("proxies")))
+    kwargs.setdefault("timeout", SOURCE_TIMEOUTS.get(source, DEFAULT_TIMEOUT))
+    for attempt in range(THROTTLE_RETRIES + 1):
+        # Wait for the host's rate limit before taking an in-flight slot
+        RATE_LIMITER.acquire(host, source)
+        with in_flight(source):
+            start = time.perf_counter()
+            _request_labels.labels = {"source": source, "host": host}
+            try:
+                response = session.get(url, **kwargs)
+            except requests.exceptions.RequestException as e:
+                METRICS.inc("http_errors_total", source=source, host=host, error=type(e).__name__)
+                raise
+            finally:
+                _request_labels.labels = {}
+            METRICS.observe("http_request_seconds", time.perf_counter() - start, source=source, host=host)
+        METRICS.inc("http_requests_total", source=source, host=host, status=response.status_code)
+        METRICS.inc("http_response_bytes_total", _response_bytes(response, kwargs.get("stream")),
+                    source=source, host=host)
+        RATE_LIMITER.feedback(host, response.status_code, response.headers.get("Retry-After"))
+        if response.status_code not in (429, 503) or attempt == THROTTLE_RETRIES:
+            return response
+        METRICS.inc("http_retries_total", reason="throttle", source=source, host=host)
+        response.close()
+
+def get(url, source=None, cache=True, **kwargs):
+    """
+    requests.get() that goes through the response cache, the per-host rate limiter
+    and the configured in-flight limits for `source`. cache=False always hits the network.
+
+    Requests reuse the host's pooled keep-alive session and get the source's
+    timeout (SOURCE_TIMEOUTS) unless one is passed.
+    """
+    response_cache = _get_cache() if cache else None
+    if response_cache is None:
+        return _send(url, source, **kwargs)
+    response = response_cache.get(lambda u, **kw: _send(u, source, **kw), url, source=source, **kwargs)
+    if getattr(response, "from_cache", False):
+        METRICS.inc("http_cache_hits_total", source=source, host=urlsplit(url).netloc)
+    return response
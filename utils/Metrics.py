@@ -0,0 +1,188 @@
+import bisect
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+# Snapshot file written by the exporter; the extension picks the format
+METRICS_FILE = "metrics.prom"
+PREFIX = "scrawler_"
+# Upper bounds (seconds) of the latency histogram buckets, Prometheus-style
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+class _Histogram:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self, size):
+        self.counts = [0] * (size + 1)
+        self.sum = 0.0
+        self.count = 0
+
+def _label_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items() if v is not None))
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+class MetricsRegistry:
+    """
+    In-process counters, gauges and latency histograms, keyed by name and labels.
+
+    Updating a metric is a dict lookup under a lock, cheap enough to leave on in
+    every run. snapshot() returns plain data, to_json() and to_prometheus() render
+    it, and start_exporter() rewrites a file with it every few seconds.
+
+    Usage:
+        METRICS.inc("http_requests_total", source="crossref", host="api.crossref.org", status=200)
+        with METRICS.timer("parse_seconds", source="crossref"):
+            ...
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._counters = {}
+        self._gauges = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+        self._exporter = None
+        self._stop = threading.Event()
+
+    def inc(self, name, value=1, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        with self._lock:
+            self._gauges[(name, _label_key(labels))] = value
+
+    def observe(self, name, seconds, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = _Histogram(len(self.buckets))
+            histogram.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+            histogram.sum += seconds
+            histogram.count += 1
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """Observes the duration of the block in histogram `name`."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._histograms.clear()
+
+    # ---------------- Snapshots ----------------
+
+    def snapshot(self):
+        """
+        Returns the current values as plain data:
+          {"counters": [...], "gauges": [...], "histograms": [...]}
+        Histogram buckets are cumulative, keyed by their upper bound.
+        """
+        with self._lock:
+            counters = [{"name": n, "labels": dict(k), "value": v} for (n, k), v in self._counters.items()]
+            gauges = [{"name": n, "labels": dict(k), "value": v} for (n, k), v in self._gauges.items()]
+            histograms = []
+            for (name, key), h in self._histograms.items():
+                running, buckets = 0, {}
+                for bound, count in zip(self.buckets + ("+Inf",), h.counts):
+                    running += count
+                    buckets[str(bound)] = running
+                histograms.append({"name": name, "labels": dict(key), "count": h.count,
+                                   "sum": round(h.sum, 6), "buckets": buckets})
+        return {"timestamp": time.time(), "counters": counters, "gauges": gauges, "histograms": histograms}
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), indent=2)
+
+    def to_prometheus(self):
+        """Renders the snapshot in the Prometheus text exposition format."""
+        snap = self.snapshot()
+        lines = []
+        for kind, items in (("counter", snap["counters"]), ("gauge", snap["gauges"])):
+            for name in sorted({i["name"] for i in items}):
+                lines.append(f"# TYPE {PREFIX}{name} {kind}")
+                for i in items:
+                    if i["name"] == name:
+                        lines.append(f"{PREFIX}{name}{_format_labels(_label_key(i['labels']))} {i['value']}")
+        for name in sorted({h["name"] for h in snap["histograms"]}):
+            lines.append(f"# TYPE {PREFIX}{name} histogram")
+            for h in snap["histograms"]:
+                if h["name"] != name:
+                    continue
+                key = _label_key(h["labels"])
+                for bound, count in h["buckets"].items():
+                    lines.append(f"{PREFIX}{name}_bucket{_format_labels(key, [('le', bound)])} {count}")
+                lines.append(f"{PREFIX}{name}_sum{_format_labels(key)} {h['sum']}")
+                lines.append(f"{PREFIX}{name}_count{_format_labels(key)} {h['count']}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path=METRICS_FILE):
+        """Writes a snapshot to `path` atomically: JSON for .json files, Prometheus text otherwise."""
+        text = self.to_json() if path.endswith(".json") else self.to_prometheus()
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp, path)
+
+    def start_exporter(self, path=METRICS_FILE, interval=15):
+        """Rewrites `path` every `interval` seconds from a daemon thread until stop_exporter()."""
+        self.stop_exporter()
+        self._stop.clear()
+
+        def run():
+            while not self._stop.wait(interval):
+                self.write(path)
+
+        self._exporter = (threading.Thread(target=run, daemon=True), path)
+        self._exporter[0].start()
+
+    def stop_exporter(self):
+        """Stops the exporter thread and writes one last snapshot."""
+        if self._exporter is None:
+            return
+        thread, path = self._exporter
+        self._stop.set()
+        thread.join()
+        self._exporter = None
+        self.write(path)
+
+METRICS = MetricsRegistry()
+
+@contextmanager
+def trace_memory(name="peak_memory_bytes", **labels):
+    """
+    Opt-in tracemalloc around the block; records the peak as a gauge.
+
+    tracemalloc slows allocation-heavy code considerably, so this is kept out of
+    normal runs.
+    """
+    already_tracing = tracemalloc.is_tracing()
+    if not already_tracing:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    try:
+        yield
+    finally:
+        _, peak = tracemalloc.get_traced_memory()
+        if not already_tracing:
+            tracemalloc.stop()
+        METRICS.set(name, peak, **labels)
@@ -0,0 +1,308 @@
+import functools
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from utils.Database_Calls import PAPER_COLUMNS
+from utils.Metrics import METRICS
+
+# Items waiting between two stages before the upstream stage blocks
+QUEUE_SIZE = 8
+# How often a blocked stage checks whether the pipeline was aborted
+POLL_SECONDS = 0.5
+
+_options = {"queue_size": QUEUE_SIZE, "workers": 1, "processes": False}
+
+def configure_pipeline(queue_size=QUEUE_SIZE, workers=1, processes=False):
+    """
+    Defaults for the pipelines the fetchers build: queue size between stages, and
+    how many normalize workers run, in threads or (processes=True) in a process pool.
+    """
+    _options.update(queue_size=queue_size, workers=workers, processes=processes)
+
+def pipeline_options():
+    return dict(_options)
+
+class PaperRecord:
+    """One normalized paper on its way to the writer; same fields as PaperSink.add."""
+    __slots__ = PAPER_COLUMNS + ("doi",)
+
+    def __init__(self, title, authors, year, source, link, abstract, keywords, citations=0, doi=None):
+        self.title = title
+        self.authors = authors
+        self.year = year
+        self.source = source
+        self.link = link
+        self.abstract = abstract
+        self.keywords = keywords
+        self.citations = citations
+        self.doi = doi
+
+    def astuple(self):
+        return tuple(getattr(self, field) for field in self.__slots__)
+
+    # Slotted objects have no __dict__, so they are pickled field by field
+    def __getstate__(self):
+        return self.astuple()
+
+    def __setstate__(self, state):
+        for field, value in zip(self.__slots__, state):
+            setattr(self, field, value)
+
+    def __repr__(self):
+        return f"PaperRecord({self.source!r}, {self.title!r})"
+
+class _Stop:
+    pass
+
+_STOP = _Stop()
+
+class _Aborted(Exception):
+    pass
+
+class Stage:
+    """
+    One step of a Pipeline: `func(item)` returns an iterable of items for the next
+    stage (None for the last one). Runs in `workers` threads; with processes=True
+    each thread hands its items to a process pool of the same size, so CPU-bound
+    work runs outside the GIL. `func` must then be picklable.
+    """
+
+    def __init__(self, name, func, workers=1, processes=False):
+        self.name = name
+        self.func = func
+        self.workers = workers
+        self.processes = processes
+        self.items_in = 0
+        self.items_out = 0
+        self.busy_seconds = 0.0
+        self.waiting_seconds = 0.0
+        self.blocked_seconds = 0.0
+        self.max_queue_depth = 0
+        self._lock = threading.Lock()
+
+class Pipeline:
+    """
+    Runs `source` (an iterable, typically a fetcher's payload generator) through
+    `stages` on their own threads, connected by bounded queues.
+
+    A full queue blocks the stage feeding it, so a slow writer holds back
+    parsing and fetching instead of letting payloads pile up in memory, while a
+    fast one never waits for the network. Per stage, METRICS records items
+    processed (pipeline_items_total), time spent working (pipeline_busy_seconds),
+    waiting for input (pipeline_waiting_seconds) and blocked on a full output
+    queue (pipeline_blocked_seconds), and the depth of its input queue
+    (pipeline_queue_depth). The busiest stage per worker is the bottleneck.
+
+    An exception in any stage stops the others and is raised from run().
+
+    Usage:
+        stats = Pipeline("crossref", iter_pages(), [
+            Stage("normalize", normalize_page, workers=2),
+            Stage("store", store),
+        ]).run()
+    """
+
+    def __init__(self, name, source, stages, queue_size=None):
+        self.name = name
+        self.source = source
+        self.fetch = Stage("fetch", None)
+        self.stages = [self.fetch] + list(stages)
+        size = queue_size or _options["queue_size"]
+        # queues[i] feeds stages[i]; the fetch stage reads from `source` instead
+        self.queues = [None] + [queue.Queue(maxsize=size) for _ in stages]
+        self._abort = threading.Event()
+        self._errors = []
+        self._remaining = {}
+        self._lock = threading.Lock()
+
+    def _labels(self, stage):
+        return {"pipeline": self.name, "stage": stage.name}
+
+    def _put(self, index, item):
+        """Hands `item` to stages[index], waiting while its queue is full."""
+        q = self.queues[index]
+        stage = self.stages[index - 1]
+        start = time.perf_counter()
+        while True:
+            if self._abort.is_set():
+                raise _Aborted()
+            try:
+                q.put(item, timeout=POLL_SECONDS)
+                break
+            except queue.Full:
+                continue
+        waited = time.perf_counter() - start
+        depth = q.qsize()
+        target = self.stages[index]
+        with target._lock:
+            target.max_queue_depth = max(target.max_queue_depth, depth)
+        with stage._lock:
+            stage.blocked_seconds += waited
+            stage.items_out += 1
+        METRICS.set("pipeline_queue_depth", depth, **self._labels(target))
+
+    def _get(self, index):
+        q = self.queues[index]
+        start = time.perf_counter()
+        while True:
+            if self._abort.is_set():
+                raise _Aborted()
+            try:
+                item = q.get(timeout=POLL_SECONDS)
+                break
+            except queue.Empty:
+                continue
+        stage = self.stages[index]
+        with stage._lock:
+            stage.waiting_seconds += time.perf_counter() - start
+        METRICS.set("pipeline_queue_depth", q.qsize(), **self._labels(stage))
+        return item
+
+    def _emit(self, index, results):
+        if results is None or index + 1 >= len(self.stages):
+            return
+        for result in results:
+            self._put(index + 1, result)
+
+    def _record(self, stage, seconds, items=1):
+        with stage._lock:
+            stage.items_in += items
+            stage.busy_seconds += seconds
+        labels = self._labels(stage)
+        METRICS.inc("pipeline_items_total", items, **labels)
+        METRICS.inc("pipeline_busy_seconds", seconds, **labels)
+
+    def _run_fetch(self):
+        iterator = iter(self.source)
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    payload = next(iterator)
+                except StopIteration:
+                    break
+                self._record(self.fetch, time.perf_counter() - start)
+                self._put(1, payload)
+        finally:
+            # Lets a generator release its open response when the pipeline stops early
+            if hasattr(iterator, "close"):
+                iterator.close()
+
+    def _run_stage(self, index, pool):
+        stage = self.stages[index]
+        while True:
+            item = self._get(index)
+            if item is _STOP:
+                break
+            start = time.perf_counter()
+            results = pool.submit(stage.func, item).result() if pool else stage.func(item)
+            if results is not None and not isinstance(results, list):
+                results = list(results)
+            self._record(stage, time.perf_counter() - start)
+            self._emit(index, results)
+
+    def _worker(self, index, pool):
+        try:
+            if index == 0:
+                self._run_fetch()
+            else:
+                self._run_stage(index, pool)
+        except _Aborted:
+            pass
+        except BaseException as e:
+            self._errors.append(e)
+            self._abort.set()
+        finally:
+            self._finish(index)
+
+    def _finish(self, index):
+        """Once the last worker of a stage is done, tells every worker of the next one to stop."""
+        with self._lock:
+            self._remaining[index] -= 1
+            last = self._remaining[index] == 0
+        if last and index + 1 < len(self.stages) and not self._abort.is_set():
+            for _ in range(self.stages[index + 1].workers):
+                try:
+                    self._put_stop(index + 1)
+                except _Aborted:
+                    return
+
+    def _put_stop(self, index):
+        while True:
+            if self._abort.is_set():
+                raise _Aborted()
+            try:
+                self.queues[index].put(_STOP, timeout=POLL_SECONDS)
+                return
+            except queue.Full:
+                continue
+
+    def run(self):
+        """Runs every stage to completion; returns stats() or raises the first stage error."""
+        pools = [ProcessPoolExecutor(max_workers=s.workers) if s.processes else None for s in self.stages]
+        threads = []
+        start = time.perf_counter()
+        try:
+            for index, stage in enumerate(self.stages):
+                self._remaining[index] = stage.workers
+            for index, stage in enumerate(self.stages):
+                for n in range(stage.workers):
+                    thread = threading.Thread(target=self._worker, args=(index, pools[index]),
+                                              name=f"{self.name}-{stage.name}-{n}", daemon=True)
+                    thread.start()
+                    threads.append(thread)
+            for thread in threads:
+                thread.join()
+        finally:
+            self._abort.set()
+            for pool in pools:
+                if pool is not None:
+                    pool.shutdown(cancel_futures=True)
+            for stage in self.stages:
+                labels = self._labels(stage)
+                METRICS.inc("pipeline_waiting_seconds", stage.waiting_seconds, **labels)
+                METRICS.inc("pipeline_blocked_seconds", stage.blocked_seconds, **labels)
+        if self._errors:
+            raise self._errors[0]
+        self.seconds = time.perf_counter() - start
+        return self.stats()
+
+    def stats(self):
+        """Per-stage counters, plus the stage that was busiest per worker."""
+        stages = {s.name: {"workers": s.workers, "items_in": s.items_in, "items_out": s.items_out,
+                           "busy_seconds": round(s.busy_seconds, 3),
+                           "waiting_seconds": round(s.waiting_seconds, 3),
+                           "blocked_seconds": round(s.blocked_seconds, 3),
+                           "max_queue_depth": s.max_queue_depth} for s in self.stages}
+        bottleneck = max(self.stages, key=lambda s: s.busy_seconds / s.workers).name
+        return {"pipeline": self.name, "stages": stages, "bottleneck": bottleneck}
+
+def _as_batch(normalize, payload):
+    # One queue item per payload instead of per record keeps queue traffic low
+    return [list(normalize(payload))]
+
+def run_paper_pipeline(name, payloads, normalize, sink, workers=None, processes=None, queue_size=None):
+    """
+    fetch -> normalize -> store: `payloads` yields raw pages, `normalize(page)`
+    returns PaperRecords, and a single writer adds them to `sink`. Options default
+    to configure_pipeline(); with processes=True `normalize` must be a module-level
+    function (or a functools.partial of one). Returns the number of records stored.
+    """
+    options = {**_options, **{k: v for k, v in (("workers", workers), ("processes", processes),
+                                                 ("queue_size", queue_size)) if v is not None}}
+    stored = 0
+
+    def store(records):
+        nonlocal stored
+        for record in records:
+            sink.add(*record.astuple())
+        stored += len(records)
+        METRICS.inc("pipeline_records_total", len(records), pipeline=name)
+
+    Pipeline(name, payloads, [
+        Stage("normalize", functools.partial(_as_batch, normalize), workers=options["workers"],
+              processes=options["processes"]),
+        Stage("store", store),
+    ], queue_size=options["queue_size"]).run()
+    return stored
@@ -3,29 +3,15 @@ import re
 import time
 import random
 import json
-import pandas as pd
+import atexit
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from bs4 import BeautifulSoup
-from fake_useragent import UserAgent
-from tqdm import tqdm
-from requests.exceptions import ProxyError, ConnectTimeout
 
 BAD_PROXIES_FILE = "bad_proxies.json"
 MAX_RETRIES = 5
-
-# Load bad proxies from file
-def load_bad_proxies():
-    try:
-        with open(BAD_PROXIES_FILE, "r") as f:
-            return set(json.load(f))
-    except (FileNotFoundError, json.JSONDecodeError):
-        return set()
-
-# Save bad proxies to file
-def save_bad_proxy(proxy):
-    bad_proxies = load_bad_proxies()
-    bad_proxies.add(proxy)
-    with open(BAD_PROXIES_FILE, "w") as f:
-        json.dump(list(bad_proxies), f, indent=4)
+# Cheap endpoint used to check that a proxy actually forwards traffic
+PROBE_URL = "http://www.gstatic.com/generate_204"
 
 # Get proxies from free sources
 def get_proxies():
@@ -51,14 +37,222 @@ def get_proxies():
         print(f"Error fetching proxies: {e}")
         return []
 
-PROXIES = get_proxies()
-print(f"Using {len(PROXIES)} proxies after filtering bad ones")
+def _proxy_address(proxy):
+    """Accepts either "ip:port" or a requests-style {"http": "http://ip:port", ...} dict."""
+    if isinstance(proxy, dict):
+        proxy = proxy.get("http", "")
+    return proxy.split("//")[-1]
+
+class ProxyPool:
+    """
+    Lazily loaded, health-scored pool of free proxies.
+
+    Nothing touches the network until the first get_proxy(). Candidates from
+    `candidates` (get_proxies by default) are then probed concurrently and only the
+    ones that answer are kept. Each proxy tracks its success rate and a moving
+    average latency, and get_proxy() picks at random weighted by
+    success rate / latency.
+
+    Validation runs outside the pool's lock, so threads reporting results are
+    never held up by it. If every proxy ends up banned, the next get_proxy()
+    loads a fresh set, at most once per `reload_interval` seconds.
+
+    A proxy that fails `max_failures` times in a row is banned for `ban_cooldown`
+    seconds. Bans live in memory and are written to `bad_file` at most every
+    `flush_interval` seconds, checked on ban() and get_proxy(), and at exit,
+    not on every failure.
+    """
+
+    def __init__(self, candidates=get_proxies, bad_file=BAD_PROXIES_FILE, probe_url=PROBE_URL,
+                 probe_timeout=5, validate_workers=32, target_size=25, max_failures=2,
+                 ban_cooldown=6 * 3600, flush_interval=60, reload_interval=300):
+        self.candidates = candidates
+        self.bad_file = bad_file
+        self.probe_url = probe_url
+        self.probe_timeout = probe_timeout
+        self.validate_workers = validate_workers
+        self.target_size = target_size
+        self.max_failures = max_failures
+        self.ban_cooldown = ban_cooldown
+        self.flush_interval = flush_interval
+        self.reload_interval = reload_interval
+        self.stats = {}
+        self.banned = None
+        self._loaded = False
+        self._next_load = 0.0
+        # Held for the whole validation; only one thread loads at a time
+        self._load_lock = threading.Lock()
+        self._dirty = False
+        self._last_flush = time.monotonic()
+        self._lock = threading.RLock()
+        atexit.register(self.flush)
+
+    # ---------------- Ban list ----------------
+
+    def _load_bans(self):
+        """Reads bad_file: {proxy: banned_until} or the older plain list of proxies."""
+        try:
+            with open(self.bad_file, "r") as f:
+                data = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+        if isinstance(data, list):
+            # Old format has no timestamps: start their cooldown now, and write it back
+            # so a restart doesn't start it again
+            until = time.time() + self.ban_cooldown
+            self._dirty = True
+            return {proxy: until for proxy in data}
+        return {proxy: float(until) for proxy, until in data.items()}
+
+    def _bans(self):
+        if self.banned is None:
+            self.banned = self._load_bans()
+        return self.banned
+
+    def is_banned(self, proxy):
+        address = _proxy_address(proxy)
+        with self._lock:
+            until = self._bans().get(address)
+            if until is None:
+                return False
+            if until <= time.time():
+                # Cooldown over: back into rotation, keeping its history
+                del self.banned[address]
+                if address in self.stats:
+                    self.stats[address]["streak"] = 0
+                self._dirty = True
+                return False
+            return True
+
+    def ban(self, proxy):
+        address = _proxy_address(proxy)
+        with self._lock:
+            self._bans()[address] = time.time() + self.ban_cooldown
+            self._dirty = True
+        self._maybe_flush()
+
+    def _maybe_flush(self):
+        if time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
 
-ua = UserAgent()
+    def flush(self):
+        """Writes the ban list to bad_file if it changed, dropping expired bans."""
+        with self._lock:
+            if not self._dirty or self.banned is None:
+                return
+            now = time.time()
+            self.banned = {p: until for p, until in self.banned.items() if until > now}
+            with open(self.bad_file, "w") as f:
+                json.dump(self.banned, f, indent=4)
+            self._dirty = False
+            self._last_flush = time.monotonic()
+
+    # ---------------- Loading and validation ----------------
+
+    def _probe(self, address):
+        proxy = {"http": f"http://{address}", "https": f"http://{address}"}
+        start = time.monotonic()
+        try:
+            response = requests.get(self.probe_url, proxies=proxy, timeout=self.probe_timeout)
+            if response.status_code < 400:
+                return address, time.monotonic() - start
+        except requests.exceptions.RequestException:
+            pass
+        return address, None
+
+    def _load(self):
+        candidates = [p for p in dict.fromkeys(self.candidates()) if not self.is_banned(p)]
+        random.shuffle(candidates)
+        print(f"Validating {len(candidates)} candidate proxies...")
+        healthy = 0
+        with ThreadPoolExecutor(max_workers=self.validate_workers) as pool:
+            futures = [pool.submit(self._probe, address) for address in candidates]
+            for future in as_completed(futures):
+                address, latency = future.result()
+                if latency is None:
+                    continue
+                with self._lock:
+                    self.stats[address] = {"successes": 1, "failures": 0, "streak": 0, "latency": latency}
+                healthy += 1
+                if healthy >= self.target_size:
+                    for f in futures:
+                        f.cancel()
+                    break
+        print(f"Using {healthy} validated proxies")
+
+    def _needs_load(self):
+        with self._lock:
+            if not self._loaded:
+                return True
+            return time.monotonic() >= self._next_load and len(self) == 0
+
+    def ensure_loaded(self):
+        """Validates candidates on first use, and again when the pool has run dry."""
+        if not self._needs_load():
+            return
+        with self._load_lock:
+            # Another thread may have loaded the pool while this one waited
+            if not self._needs_load():
+                return
+            self._load()
+            with self._lock:
+                self._loaded = True
+                self._next_load = time.monotonic() + self.reload_interval
+
+    # ---------------- Selection and feedback ----------------
+
+    def _weight(self, s):
+        success_rate = (s["successes"] + 1) / (s["successes"] + s["failures"] + 2)
+        return success_rate / (s["latency"] + 0.1)
+
+    def get_proxy(self):
+        """Returns a requests-style proxies dict chosen by health, or None if the pool is empty."""
+        self.ensure_loaded()
+        with self._lock:
+            live = [(a, s) for a, s in self.stats.items() if not self.is_banned(a)]
+            if not live:
+                return None
+            address = random.choices([a for a, _ in live], [self._weight(s) for _, s in live])[0]
+        # Bans made during a quiet stretch reach bad_file without waiting for the next ban
+        self._maybe_flush()
+        # Free proxies are plain HTTP proxies (CONNECT for https), which is what _probe checked
+        return {"http": f"http://{address}", "https": f"http://{address}"}
+
+    def report_success(self, proxy, latency):
+        address = _proxy_address(proxy)
+        with self._lock:
+            s = self.stats.get(address)
+            if s is not None:
+                s["successes"] += 1
+                s["streak"] = 0
+                s["latency"] = 0.7 * s["latency"] + 0.3 * latency
+
+    def report_failure(self, proxy):
+        """Counts a failure; bans the proxy after max_failures in a row."""
+        address = _proxy_address(proxy)
+        with self._lock:
+            s = self.stats.get(address)
+            if s is not None:
+                s["failures"] += 1
+                s["streak"] += 1
+                if s["streak"] < self.max_failures:
+                    return
+            self.ban(address)
+
+    def __len__(self):
+        with self._lock:
+            return sum(1 for a in self.stats if not self.is_banned(a))
+
+PROXY_POOL = ProxyPool()
+
+# Load bad proxies from file
+def load_bad_proxies():
+    return {p for p in list(PROXY_POOL._bans()) if PROXY_POOL.is_banned(p)}
+
+# Save bad proxies to file
+def save_bad_proxy(proxy):
+    PROXY_POOL.ban(proxy)
 
-# Get a random proxy
+# Get a proxy from the shared pool
 def get_proxy():
-    if not PROXIES:
-        return None
-    proxy = random.choice(PROXIES)
-    return {"http": f"http://{proxy}", "https": f"https://{proxy}"}
\ No newline at end of file
+    return PROXY_POOL.get_proxy()
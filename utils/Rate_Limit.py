@@ -0,0 +1,124 @@
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+# Per-source limits in requests/second: where each host starts, how far it may ramp
+# up while it keeps answering, and how many requests may go out back to back.
+SOURCE_RATES = {
+    "crossref": {"rate": 10, "max_rate": 50, "burst": 10},
+    # NCBI's documented cap is 3/s (10/s with an API key); never ramp past it
+    "pubmed": {"rate": 3, "max_rate": 3, "burst": 1},
+    "hal": {"rate": 5, "max_rate": 10, "burst": 5},
+    "theses_fr": {"rate": 2, "max_rate": 5, "burst": 2},
+    "paperity": {"rate": 0.5, "max_rate": 2, "burst": 1},
+    "universityguru": {"rate": 0.3, "max_rate": 1, "burst": 1},
+    "google_scholar": {"rate": 0.3, "max_rate": 0.5, "burst": 1},
+}
+DEFAULT_RATE = {"rate": 2, "max_rate": 5, "burst": 2}
+MIN_RATE = 0.05
+# Status codes that mean "slow down"
+THROTTLE_STATUSES = {403, 429, 503}
+# Successful responses in a row before the rate is raised again
+RECOVERY_WINDOW = 20
+
+def parse_retry_after(value):
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date), or None."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+class _Bucket:
+    def __init__(self, rate, max_rate, burst):
+        self.rate = rate
+        self.max_rate = max_rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.streak = 0
+
+class RateLimiter:
+    """
+    Adaptive token bucket per host, shared by every fetcher.
+
+    A host's bucket is created from its source's entry in SOURCE_RATES the first
+    time it is used. On a throttling response (403/429/503) the host's rate is
+    halved and no request goes out until its Retry-After (or one refill interval)
+    has passed; after RECOVERY_WINDOW successes in a row the rate grows by 25%,
+    up to the source's max_rate.
+    """
+
+    def __init__(self, source_rates=None):
+        self.source_rates = {**SOURCE_RATES, **(source_rates or {})}
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def _bucket(self, host, source):
+        bucket = self._buckets.get(host)
+        if bucket is None:
+            bucket = _Bucket(**self.source_rates.get(source, DEFAULT_RATE))
+            self._buckets[host] = bucket
+        return bucket
+
+    def configure(self, host, source=None, rate=None, max_rate=None, burst=None):
+        """
+        Overrides the limits of one host, e.g. when an API key raises its quota.
+        Limits not given keep their current value, or `source`'s SOURCE_RATES
+        entry if the host has no bucket yet.
+        """
+        with self._lock:
+            bucket = self._bucket(host, source)
+            if max_rate is not None:
+                bucket.max_rate = max_rate
+            if rate is not None:
+                bucket.rate = min(rate, bucket.max_rate)
+            if burst is not None:
+                bucket.burst = burst
+
+    def acquire(self, host, source=None):
+        """Blocks until `host` may receive another request."""
+        while True:
+            with self._lock:
+                bucket = self._bucket(host, source)
+                now = time.monotonic()
+                bucket.tokens = min(bucket.burst, bucket.tokens + (now - bucket.updated) * bucket.rate)
+                bucket.updated = now
+                if now >= bucket.blocked_until and bucket.tokens >= 1:
+                    bucket.tokens -= 1
+                    return
+                wait = max(bucket.blocked_until - now, (1 - bucket.tokens) / bucket.rate)
+            time.sleep(wait)
+
+    def feedback(self, host, status, retry_after=None):
+        """Adjusts `host`'s rate from the status (and Retry-After header) of its last response."""
+        with self._lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                return
+            if status in THROTTLE_STATUSES:
+                bucket.rate = max(MIN_RATE, bucket.rate / 2)
+                bucket.streak = 0
+                bucket.tokens = 0
+                delay = parse_retry_after(retry_after)
+                if delay is None:
+                    delay = 1 / bucket.rate
+                bucket.blocked_until = max(bucket.blocked_until, time.monotonic() + delay)
+            elif status < 400:
+                bucket.streak += 1
+                if bucket.streak >= RECOVERY_WINDOW and bucket.rate < bucket.max_rate:
+                    bucket.rate = min(bucket.max_rate, bucket.rate * 1.25)
+                    bucket.streak = 0
+
+    def rate(self, host):
+        with self._lock:
+            bucket = self._buckets.get(host)
+            return bucket.rate if bucket else None
+
+RATE_LIMITER = RateLimiter()